@@ -0,0 +1,278 @@
+"""
+Benchmark suite for the CA constraint encoders.
+
+Runs a fixed corpus of problems through the single-layer encodings of
+z3_ca.py (CAUnrolling, which find_all_z3_solutions_neighbor_count uses for
+every encoding but its original int one) and the two-layer WalkerSearch of
+csp_multi_ca/csp_z3.py:
+
+  - shifted gliders, which have rulesets, over several grid sizes and step
+    counts;
+  - a lone cell that has to move, which has none (known UNSAT);
+  - the "John Fish" and "O Bear" walkers of csp_multi_ca/README.md with their
+    seeds pinned, at their period 3 (SAT) and at shorter periods (UNSAT).
+
+Every case runs in a fresh process, so peak memory is per case and no solver
+state carries over. Each result line of the JSONL output holds the case id,
+build and solve seconds, the model count, the process's peak resident memory
+and the solver's Z3 statistics; --solver-config runs the corpus under
+another Z3 configuration. With --baseline, results are compared with an
+earlier output file and the command exits with status 1 on a regression: a
+changed status or model count, or a build or solve time more than
+--tolerance times the baseline's.
+
+Example:
+    python benchmark.py --output benchmark.jsonl --baseline benchmark_baseline.jsonl
+"""
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from portfolio import SOLVER_CONFIGS, configs_for
+from telemetry import peak_rss_kb, z3_statistics
+from z3_ca import ENCODINGS, CAUnrolling, SolverTimeout, pad_grid, shift_grid
+
+# The two-layer search lives next door.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csp_multi_ca"))
+
+GLIDER = [[0, 1, 0],
+          [0, 0, 1],
+          [1, 1, 1]]
+
+# The README's walkers as gridBlue/gridOrange strings of its 9x9 ca.html
+# configs, with the offset they replicate at after 3 steps.
+JOHN_FISH = {
+    'grid_blue': "000000000000000000000000000001010000000001000001010000000000000000000000000000000",
+    'grid_orange': "000000000000000000000010000000001000000011100000001000000010000000000000000000000",
+    'offset': (0, 1),
+}
+O_BEAR = {
+    'grid_blue': "000000000000000000000010000000000000001001000000010000000000000000000000000000000",
+    'grid_orange': "000000000000000000000010000000111000001101100000110000000010000000000000000000000",
+    'offset': (1, 1),
+}
+# Both fit in the 5x5 window at rows/cols 2..6.
+WALKER_WINDOW = (2, 5)
+WALKER_ENCODINGS = ("int", "bitvec")
+
+def benchmark_cases():
+    """
+    Returns the corpus as a list of case dicts, one per problem and encoding.
+    'models' is the known number of solutions (rulesets, or ruleset families
+    where 'families' is set); a run that finds another number is wrong.
+    """
+    problems = []
+    for grid_size in [7, 9, 11]:
+        problems.append(dict(name=f"glider_4steps_{grid_size}", kind="neighbor_count",
+                             seed=GLIDER, grid_size=grid_size, steps=4, shift=(1, 1),
+                             families=True, models=1))
+    problems.append(dict(name="glider_4steps_7_all", kind="neighbor_count", seed=GLIDER,
+                         grid_size=7, steps=4, shift=(1, 1), families=False, models=256))
+    problems.append(dict(name="glider_1step_9_all", kind="neighbor_count", seed=GLIDER,
+                         grid_size=9, steps=1, shift=(0, 0), families=False, models=1024))
+    for grid_size, steps in [(7, 1), (9, 2), (11, 2)]:
+        problems.append(dict(name=f"lone_cell_{steps}steps_{grid_size}", kind="neighbor_count",
+                             seed=[[1]], grid_size=grid_size, steps=steps, shift=(1, 0),
+                             families=False, models=0))
+    for name, walker in [("john_fish", JOHN_FISH), ("o_bear", O_BEAR)]:
+        for grid_size in [9, 11]:
+            for periods, models in [([3], 1), ([1, 2], 0)]:
+                label = f"{name}_{grid_size}_periods_{min(periods)}_{max(periods)}"
+                problems.append(dict(name=label, kind="walker", walker=walker, grid_size=grid_size,
+                                     periods=periods, families=True, models=models))
+    cases = []
+    for problem in problems:
+        encodings = ENCODINGS if problem['kind'] == "neighbor_count" else WALKER_ENCODINGS
+        for encoding in encodings:
+            cases.append(dict(problem, id=f"{problem['name']}/{encoding}", encoding=encoding))
+    return cases
+
+def _run_neighbor_count(case, timeout):
+    grid_size = case['grid_size']
+    start_config = pad_grid(case['seed'], target_size=grid_size)
+    end_config = shift_grid(start_config, *case['shift'])
+    started = time.perf_counter()
+    unrolling = CAUnrolling(grid_size, case['steps'], encoding=case['encoding'],
+                            solver_config=case.get('solver_config'))
+    built = time.perf_counter()
+    try:
+        models = len(unrolling.find_all_solutions(start_config, end_config, timeout,
+                                                  case['families']))
+        status = "sat" if models else "unsat"
+    except SolverTimeout as e:
+        models = len(e.solutions)
+        status = "timeout"
+    return status, models, built - started, time.perf_counter() - built, unrolling.solver
+
+def _run_walker(case, timeout):
+    from csp_z3 import WalkerSearch
+    walker = case['walker']
+    grid_size = case['grid_size']
+    window_start, seed_size = WALKER_WINDOW
+    seeds = [[[int(grid[9 * (window_start + r) + window_start + c]) for c in range(seed_size)]
+              for r in range(seed_size)]
+             for grid in [walker['grid_blue'], walker['grid_orange']]]
+    # Centred, as pad_grid places seeds.
+    seed_start = (grid_size - seed_size) // 2
+    started = time.perf_counter()
+    search = WalkerSearch(grid_size, case['periods'], seed_start, seed_size,
+                          [walker['offset']], encoding=case['encoding'],
+                          solver_config=case.get('solver_config'))
+    # Pin the seed, so that only the rulesets are left to the solver.
+    for r in range(seed_size):
+        for c in range(seed_size):
+            for state, seed in zip([search.state_blue, search.state_orange], seeds):
+                search.s.add(state[0][seed_start + r][seed_start + c] == seed[r][c])
+    built = time.perf_counter()
+    deadline = None if timeout is None else built + timeout
+    models = 0
+    status = None
+    walkers = search.walkers(case['families'])
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                status = "timeout"
+                break
+            search.s.set("timeout", max(1, int(remaining * 1000)))
+        if next(walkers, None) is None:
+            break
+        models += 1
+    if status is None:
+        # walkers() stops at the first check that is not sat, which may
+        # have been cut short.
+        if search.s.reason_unknown() in ("timeout", "canceled"):
+            status = "timeout"
+        else:
+            status = "sat" if models else "unsat"
+    return status, models, built - started, time.perf_counter() - built, search.s
+
+def run_case(case, timeout=None):
+    """
+    Runs one case in this process and returns its result record. Meant to
+    be called in a fresh process (see run_benchmark) so that peak_rss_kb,
+    the process's peak resident memory, belongs to this case alone.
+    """
+    runner = _run_neighbor_count if case['kind'] == "neighbor_count" else _run_walker
+    status, models, build_seconds, solve_seconds, solver = runner(case, timeout)
+    return {
+        'case': case['id'],
+        'kind': case['kind'],
+        'encoding': case['encoding'],
+        'solver_config': case.get('solver_config') or "smt",
+        'status': status,
+        'models': models,
+        'expected_models': case['models'],
+        'build_seconds': build_seconds,
+        'solve_seconds': solve_seconds,
+        'peak_rss_kb': peak_rss_kb(),
+        'z3_statistics': z3_statistics(solver),
+    }
+
+def _run_case_star(args):
+    return run_case(*args)
+
+def run_benchmark(cases, output_path, repeat=1, timeout=None):
+    """
+    Runs every case repeat times, each run in its own process, one at a time
+    so that runs do not compete for the CPU. Writes one JSON line per case to
+    output_path (replacing it) with the fastest build and solve times of its
+    runs, and returns the records.
+    """
+    # Spawned (not forked) workers start with a clean Z3 state; each worker
+    # serves a single run.
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with open(output_path, "w") as out, context.Pool(1, maxtasksperchild=1) as pool:
+        for case in cases:
+            runs = [pool.apply(_run_case_star, ((case, timeout),)) for _ in range(repeat)]
+            result = dict(runs[-1],
+                          build_seconds=min(run['build_seconds'] for run in runs),
+                          solve_seconds=min(run['solve_seconds'] for run in runs),
+                          peak_rss_kb=max(run['peak_rss_kb'] for run in runs))
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+            print(f"{result['case']}: {result['status']}, {result['models']} model(s), "
+                  f"build {result['build_seconds']:.3f}s, solve {result['solve_seconds']:.3f}s, "
+                  f"{result['peak_rss_kb'] // 1024} MB")
+    return results
+
+def load_results(path):
+    """
+    Reads a benchmark output file into a dict keyed by case id.
+    """
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record['case']: record for record in records}
+
+def find_regressions(results, baseline, tolerance=1.5, min_seconds=0.05):
+    """
+    Compares results with baseline (as returned by load_results) and returns
+    a list of messages, one per regression. A case regresses if it finds the
+    wrong number of models, if its status or model count differs from the
+    baseline, or if its build or solve time exceeds tolerance times the
+    baseline's by more than min_seconds (so noise on tiny cases is ignored).
+    Cases missing from the baseline are only checked against their known
+    model count.
+    """
+    regressions = []
+    for result in results:
+        case = result['case']
+        if result['status'] != "timeout" and result['models'] != result['expected_models']:
+            regressions.append(f"{case}: found {result['models']} model(s), "
+                               f"expected {result['expected_models']}")
+        old = baseline.get(case)
+        if old is None:
+            continue
+        if (result['status'], result['models']) != (old['status'], old['models']):
+            regressions.append(f"{case}: {result['status']} with {result['models']} model(s), "
+                               f"baseline {old['status']} with {old['models']}")
+        for field in ['build_seconds', 'solve_seconds']:
+            if result[field] > tolerance * old[field] and result[field] - old[field] > min_seconds:
+                regressions.append(f"{case}: {field} {result[field]:.3f}, "
+                                   f"baseline {old[field]:.3f}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark.jsonl",
+                        help="JSONL file the results are written to")
+    parser.add_argument("--baseline", default=None,
+                        help="earlier output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="slowdown factor over the baseline that counts as a regression")
+    parser.add_argument("--cases", default="*",
+                        help='glob over case ids, e.g. "glider_*" or "*/bitvec"')
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per case; the fastest times are reported")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed per run (default: no limit)")
+    parser.add_argument("--solver-config", choices=SOLVER_CONFIGS, default="smt",
+                        help="Z3 configuration to run the cases with (see portfolio.py); "
+                             "cases whose encoding it does not support are skipped")
+    parser.add_argument("--list", action="store_true", help="list the case ids and exit")
+    args = parser.parse_args(argv)
+
+    cases = [dict(case, solver_config=args.solver_config) for case in benchmark_cases()
+             if fnmatch.fnmatch(case['id'], args.cases) and
+             configs_for(case['encoding'], [args.solver_config])]
+    if args.list:
+        for case in cases:
+            print(case['id'])
+        return 0
+    results = run_benchmark(cases, args.output, args.repeat, args.timeout)
+    baseline = load_results(args.baseline) if args.baseline else {}
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for message in regressions:
+        print("REGRESSION", message)
+    print(f"{len(results)} case(s), {len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Z3 building blocks shared by the single-layer search (z3_ca.py) and the
+two-layer walker search (csp_multi_ca/csp_z3.py): neighbor tables, neighbor
+counts and rule lookups for the Int, Bool and row-packed BitVec encodings.
+
+A rule lookup has two halves. The count side (count_indicators, one_hot_count,
+bitvec_count) is decoded once per cell or row and reused by every rule array
+that reads the same count; the rule side (rule_lanes) is prepared once per
+rule array. The select_* functions combine one of each.
+"""
+from z3 import *
+import functools
+
+@functools.lru_cache(maxsize=None)
+def neighbor_table(grid_size, wrap_around=False):
+    """
+    Precomputes the neighbors of every cell of a grid_size x grid_size grid:
+    table[r][c] is a tuple of the (row, col) neighbors of (r, c).
+    Out-of-bound neighbors are dropped unless wrap_around is set.
+    """
+    table = []
+    for r in range(grid_size):
+        row = []
+        for c in range(grid_size):
+            cells = []
+            for dr in [-1, 0, 1]:
+                for dc in [-1, 0, 1]:
+                    if dr == 0 and dc == 0:
+                        continue
+                    rr = r + dr
+                    cc = c + dc
+                    if wrap_around:
+                        cells.append(((rr + grid_size) % grid_size, (cc + grid_size) % grid_size))
+                    elif 0 <= rr < grid_size and 0 <= cc < grid_size:
+                        cells.append((rr, cc))
+            row.append(tuple(cells))
+        table.append(tuple(row))
+    return tuple(table)
+
+def neighbor_cells(r, c, grid_size, wrap_around=False):
+    """
+    Returns the (row, col) coordinates of the neighbors of cell (r, c).
+    Out-of-bound neighbors are dropped unless wrap_around is set.
+    """
+    return list(neighbor_table(grid_size, wrap_around)[r][c])
+
+# ------------------------
+# INT ENCODING
+# ------------------------
+def count_indicators(neighbor_count):
+    """
+    Decodes an Int neighbor count (0..8) into the nine conditions
+    neighbor_count == k, for use with select_rule_indicators.
+    """
+    return [neighbor_count == k for k in range(9)]
+
+def select_rule_indicators(indicators, rule_list):
+    """
+    Selects rule_list[k] for the k whose indicator holds, as a chain of Ifs
+    over count_indicators(...).
+    """
+    expr = rule_list[8]
+    for k in range(7, -1, -1):
+        expr = If(indicators[k], rule_list[k], expr)
+    return expr
+
+# ------------------------
+# BOOL ENCODING
+# ------------------------
+def unary_count(neighbors):
+    """
+    Returns a list of Z3 Bool expressions at_least where at_least[k] holds
+    exactly when k or more of the Bool neighbors are true (k = 0..len).
+    Built as a sequential counter, so it is plain propositional logic; the
+    constant first and last terms of each stage are folded away.
+    """
+    at_least = [BoolVal(True)]
+    for n in neighbors:
+        grown = [at_least[0]]
+        for k in range(1, len(at_least) + 1):
+            carried = n if k == 1 else And(at_least[k - 1], n)
+            grown.append(Or(at_least[k], carried) if k < len(at_least) else carried)
+        at_least = grown
+    return at_least
+
+def one_hot_count(neighbors):
+    """
+    Returns Bool expressions exactly where exactly[k] holds when exactly k
+    of the Bool neighbors are true (k = 0..len), from one unary_count.
+    """
+    at_least = unary_count(neighbors)
+    n = len(neighbors)
+    if n == 0:
+        return [BoolVal(True)]
+    return ([Not(at_least[1])] + [And(at_least[k], Not(at_least[k + 1])) for k in range(1, n)] +
+            [at_least[n]])
+
+def select_rule_one_hot(exactly, rule_list):
+    """
+    Selects rule_list[k] for the k whose one_hot_count entry holds.
+    """
+    return Or([And(exactly[k], rule_list[k]) for k in range(len(exactly))])
+
+# ------------------------
+# BITVEC ENCODING
+# ------------------------
+def row_value(row):
+    """
+    Packs a row of 0/1 cells into an int whose bit c is cell c.
+    """
+    return sum(bit << c for c, bit in enumerate(row))
+
+def shift_row(row, shift):
+    """
+    Moves the cells of a row-packed BitVec shift columns right (left if
+    shift < 0); cells moved past the edge are dropped.
+    """
+    return row << shift if shift >= 0 else LShR(row, -shift)
+
+def neighbor_rows(rows, r, wrap_around=False):
+    """
+    Returns the eight row-packed BitVecs whose bit c is, for each neighbor
+    direction, the neighbor of cell (r, c) in the rows of one time step.
+    Shifts fill with dead cells at the edges unless wrap_around is set,
+    in which case they rotate.
+    """
+    grid_size = len(rows)
+    dead_row = BitVecVal(0, rows[0].size())
+    above = rows[(r - 1) % grid_size] if wrap_around or r > 0 else dead_row
+    below = rows[(r + 1) % grid_size] if wrap_around or r < grid_size - 1 else dead_row
+    if wrap_around:
+        left = lambda row: RotateLeft(row, 1)     # bit c holds cell c - 1
+        right = lambda row: RotateRight(row, 1)   # bit c holds cell c + 1
+    else:
+        left = lambda row: row << 1
+        right = lambda row: LShR(row, 1)
+    return [left(above), above, right(above),
+            left(rows[r]), right(rows[r]),
+            left(below), below, right(below)]
+
+def _add_counts(a, b):
+    """
+    Ripple-carry adds two bit-parallel counts, each a list of BitVec bit
+    planes, least significant first.
+    """
+    width = max(len(a), len(b))
+    zero = BitVecVal(0, (a + b)[0].size())
+    a = a + [zero] * (width - len(a))
+    b = b + [zero] * (width - len(b))
+    total, carry = [], None
+    for x, y in zip(a, b):
+        if carry is None:
+            total.append(x ^ y)
+            carry = x & y
+        else:
+            total.append(x ^ y ^ carry)
+            carry = (x & y) | (carry & (x ^ y))
+    return total + [carry]
+
+def bitvec_count(neighbors):
+    """
+    Adds one-bit-per-lane BitVecs with a tree of adders and returns the
+    per-lane sums as bit planes, least significant first (four planes for
+    eight neighbors).
+    """
+    counts = [[n] for n in neighbors]
+    while len(counts) > 1:
+        counts = [_add_counts(counts[i], counts[i + 1]) if i + 1 < len(counts) else counts[i]
+                  for i in range(0, len(counts), 2)]
+    return counts[0]
+
+def rule_lanes(rule_list, width):
+    """
+    Spreads 9 one-bit BitVec rule entries across width lanes (all ones or
+    all zeros) and pads them to the 16 leaves of a 4-plane multiplexer.
+    Build it once per rule array and width.
+    """
+    zero = BitVecVal(0, width)
+    lanes = [SignExt(width - 1, rule) if width > 1 else rule for rule in rule_list]
+    return lanes + [zero] * (16 - len(lanes))
+
+def select_rule_lanes(count_planes, lanes):
+    """
+    Lane c of the result is lanes[count of lane c], built as a multiplexer
+    tree on the count bit planes (see bitvec_count and rule_lanes).
+    """
+    entries = lanes[:1 << len(count_planes)]
+    for plane in count_planes:
+        entries = [(plane & entries[i + 1]) | (~plane & entries[i])
+                   for i in range(0, len(entries), 2)]
+    return entries[0]
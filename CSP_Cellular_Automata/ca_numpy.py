@@ -0,0 +1,92 @@
+import numpy as np
+
+# With dead[0] fixed to 0 there are 17 free rule bits: dead[1..8] and
+# live[0..8]. A ruleset is identified by an integer in [0, 2**17) whose bits
+# 0..7 hold dead[1..8] and whose bits 8..16 hold live[0..8].
+NUM_FREE_RULE_BITS = 17
+NUM_RULESETS = 1 << NUM_FREE_RULE_BITS
+
+def ruleset_tables(ruleset_ids):
+    """
+    Decodes an array of ruleset ids into two (len(ruleset_ids), 9) uint8
+    lookup tables, dead and live, indexed by neighbor count.
+    """
+    ids = np.asarray(ruleset_ids, dtype=np.int64)[:, None]
+    dead = np.zeros((ids.shape[0], 9), dtype=np.uint8)
+    dead[:, 1:] = (ids >> np.arange(8)) & 1
+    live = ((ids >> (8 + np.arange(9))) & 1).astype(np.uint8)
+    return dead, live
+
+def ruleset_from_id(ruleset_id):
+    """
+    Returns the {'dead': [...], 'live': [...]} dict for a ruleset id.
+    """
+    dead, live = ruleset_tables([ruleset_id])
+    return {'dead': dead[0].tolist(), 'live': live[0].tolist()}
+
+def neighbor_counts(grids, wrap_around=False):
+    """
+    Counts live neighbors for a batch of grids of shape (batch, n, n).
+    Out-of-bound neighbors count as dead unless wrap_around is set.
+    """
+    grids = grids.astype(np.uint8)
+    if wrap_around:
+        counts = np.zeros_like(grids)
+        for dr in [-1, 0, 1]:
+            for dc in [-1, 0, 1]:
+                if dr == 0 and dc == 0:
+                    continue
+                counts += np.roll(grids, (dr, dc), axis=(1, 2))
+        return counts
+    n = grids.shape[1]
+    padded = np.pad(grids, ((0, 0), (1, 1), (1, 1)))
+    counts = np.zeros_like(grids)
+    for dr in [0, 1, 2]:
+        for dc in [0, 1, 2]:
+            if dr == 1 and dc == 1:
+                continue
+            counts += padded[:, dr:dr + n, dc:dc + n]
+    return counts
+
+def step_batch(grids, dead, live, wrap_around=False):
+    """
+    Advances a batch of grids (batch, n, n) by one step, each under its own
+    ruleset given as rows of the dead and live lookup tables.
+    """
+    batch = grids.shape[0]
+    counts = neighbor_counts(grids, wrap_around).reshape(batch, -1)
+    born = np.take_along_axis(dead, counts, axis=1)
+    survive = np.take_along_axis(live, counts, axis=1)
+    flat = grids.reshape(batch, -1).astype(bool)
+    return np.where(flat, survive, born).reshape(grids.shape).astype(np.uint8)
+
+def find_all_numpy_solutions_neighbor_count(start_config, end_config, max_steps,
+                                            wrap_around=False, chunk_size=1 << 15):
+    """
+    Brute-force counterpart of z3_ca.find_all_z3_solutions_neighbor_count.
+    Steps start_config under every one of the 2**17 rulesets (dead[0] == 0)
+    at once and keeps the ones that reach end_config after max_steps.
+
+    Parameters:
+      start_config  - a 2D list representing the initial grid state (0 or 1)
+      end_config    - a 2D list representing the target grid state (0 or 1)
+      max_steps     - number of simulation steps allowed
+      wrap_around   - if True, use toroidal (wrap-around) neighbor calculation
+      chunk_size    - number of rulesets simulated together; bounds memory use
+
+    Returns:
+      A list of valid rulesets, each a dict with keys 'dead' and 'live',
+      ordered by ruleset id.
+    """
+    start = np.asarray(start_config, dtype=np.uint8)
+    end = np.asarray(end_config, dtype=np.uint8)
+    matches = []
+    for first in range(0, NUM_RULESETS, chunk_size):
+        ids = np.arange(first, min(first + chunk_size, NUM_RULESETS))
+        dead, live = ruleset_tables(ids)
+        grids = np.broadcast_to(start, (ids.shape[0],) + start.shape).copy()
+        for _ in range(max_steps):
+            grids = step_batch(grids, dead, live, wrap_around)
+        hit = (grids == end).all(axis=(1, 2))
+        matches.extend(ids[hit].tolist())
+    return [ruleset_from_id(ruleset_id) for ruleset_id in matches]
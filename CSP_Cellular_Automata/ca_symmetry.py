@@ -0,0 +1,129 @@
+import itertools
+
+# Neighbor-count rules are isotropic, so rotating or reflecting a whole
+# (start grid, shift) job gives a job with exactly the same rulesets. The
+# eight symmetries of the square are written as maps on (row, col) in an
+# n x n grid.
+DIHEDRAL_TRANSFORMS = [
+    lambda r, c, n: (r, c),                  # identity
+    lambda r, c, n: (c, n - 1 - r),          # rotate 90
+    lambda r, c, n: (n - 1 - r, n - 1 - c),  # rotate 180
+    lambda r, c, n: (n - 1 - c, r),          # rotate 270
+    lambda r, c, n: (r, n - 1 - c),          # mirror left/right
+    lambda r, c, n: (n - 1 - r, c),          # mirror top/bottom
+    lambda r, c, n: (c, r),                  # transpose
+    lambda r, c, n: (n - 1 - c, n - 1 - r),  # anti-transpose
+]
+
+def generate_grids_with_n_ones(ones_count, size=3):
+    """
+    Generates all size x size grids (as lists of lists) that contain exactly
+    ones_count ones. There are C(size*size, ones_count) of them.
+    """
+    assert 0 <= ones_count <= size * size
+    candidates = []
+    for ones_indices in itertools.combinations(range(size * size), ones_count):
+        grid_flat = [0] * (size * size)
+        for idx in ones_indices:
+            grid_flat[idx] = 1
+        candidates.append([grid_flat[i*size:(i+1)*size] for i in range(size)])
+    return candidates
+
+def transform_job(grid, shift_x, shift_y, transform):
+    """
+    Applies one of DIHEDRAL_TRANSFORMS to a square grid and to the shift
+    vector that goes with it. Returns (grid, shift_x, shift_y).
+    """
+    n = len(grid)
+    new_grid = [[0] * n for _ in range(n)]
+    for r in range(n):
+        for c in range(n):
+            rr, cc = transform(r, c, n)
+            new_grid[rr][cc] = grid[r][c]
+    r0, c0 = transform(0, 0, n)
+    r1, c1 = transform(shift_y, shift_x, n)
+    return new_grid, c1 - c0, r1 - r0
+
+def _live_bounds(grid):
+    cells = [(r, c) for r, row in enumerate(grid) for c, v in enumerate(row) if v]
+    if not cells:
+        return None
+    rows = [r for r, _ in cells]
+    cols = [c for _, c in cells]
+    return min(rows), max(rows), min(cols), max(cols)
+
+def _shift_fits(grid, shift_x, shift_y):
+    """
+    True when shift_grid moves every live cell of grid without cutting any
+    of them off at the edge.
+    """
+    n = len(grid)
+    bounds = _live_bounds(grid)
+    if bounds is None:
+        return True
+    top, bottom, left, right = bounds
+    return (0 <= top + shift_y and bottom + shift_y < n and
+            0 <= left + shift_x and right + shift_x < n)
+
+def _is_translation_free(grid, shift_x, shift_y, max_steps):
+    """
+    True when the job cannot feel the edge of a bounded grid: activity grows
+    by at most one cell per step (dead[0] == 0), so if the seed's bounding
+    box grown by max_steps and the shifted seed both fit inside the grid, the
+    job behaves exactly as on the infinite plane.
+    """
+    n = len(grid)
+    bounds = _live_bounds(grid)
+    if bounds is None:
+        return True
+    top, bottom, left, right = bounds
+    if top - max_steps < 0 or left - max_steps < 0:
+        return False
+    if bottom + max_steps >= n or right + max_steps >= n:
+        return False
+    return _shift_fits(grid, shift_x, shift_y)
+
+def _translation_key(grid, wrap_around):
+    n = len(grid)
+    if wrap_around:
+        # On a torus every cyclic roll is an exact symmetry.
+        return min(tuple(tuple(grid[(r + dr) % n][(c + dc) % n] for c in range(n))
+                         for r in range(n))
+                   for dr in range(n) for dc in range(n))
+    bounds = _live_bounds(grid)
+    if bounds is None:
+        return ()
+    top, bottom, left, right = bounds
+    return tuple(tuple(grid[r][left:right + 1]) for r in range(top, bottom + 1))
+
+def canonical_job(grid, shift_x, shift_y, max_steps, wrap_around=False):
+    """
+    Returns a hashable key shared by every (start grid, shift) job that is a
+    rotation, reflection or translated copy of this one. Jobs with equal keys
+    have exactly the same rulesets. Translations are only merged when they
+    are exact: on a torus whenever shift_grid cuts nothing off, and on a
+    bounded grid only for jobs that never reach the edge (see
+    _is_translation_free).
+    """
+    keys = []
+    for transform in DIHEDRAL_TRANSFORMS:
+        g, sx, sy = transform_job(grid, shift_x, shift_y, transform)
+        if wrap_around and _shift_fits(g, sx, sy):
+            keys.append(("torus", _translation_key(g, True), sx, sy))
+        elif not wrap_around and _is_translation_free(g, sx, sy, max_steps):
+            keys.append(("free", _translation_key(g, False), sx, sy))
+        else:
+            keys.append(("bounded", tuple(map(tuple, g)), sx, sy))
+    return min(keys)
+
+def group_equivalent_jobs(jobs, max_steps, wrap_around=False):
+    """
+    Groups (start grid, shift_x, shift_y) jobs into symmetry classes.
+    Returns a list of classes in first-seen order; each class is the list of
+    its member jobs, and the first member is the one to solve.
+    """
+    classes = {}
+    for job in jobs:
+        key = canonical_job(*job, max_steps, wrap_around)
+        classes.setdefault(key, []).append(job)
+    return list(classes.values())
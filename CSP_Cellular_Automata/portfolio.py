@@ -0,0 +1,166 @@
+"""
+Portfolio solving: the same CA query raced under several Z3 configurations.
+
+Solve times of a query vary a lot between the SMT core, a bit-blast -> SAT
+tactic pipeline, the finite-domain solver, random seeds and parallel mode,
+and which one is fastest depends on the grid size and step count. A
+Portfolio runs one process per configuration on the same query, takes the
+first result and terminates the others. It records which configuration won
+for each problem class in a SQLite file, so later runs can start the usual
+winners first (when there are fewer workers than configurations) or skip
+the race and use the best one directly.
+
+CAUnrolling (z3_ca.py) and WalkerSearch (csp_multi_ca/csp_z3.py) take a
+solver_config naming one of SOLVER_CONFIGS; find_all_z3_solutions_neighbor_count
+and find_walkers take a Portfolio. Every raced query is an enumeration under
+push/pop and blocking clauses, so configurations that are not incremental
+('sat') are not raced.
+"""
+import multiprocessing
+import os
+import time
+
+from z3 import Solver, SolverFor, Then
+
+from result_cache import ResultCache, cache_key
+
+# name -> (description, encodings it supports or None for all, incremental).
+SOLVER_CONFIGS = {
+    'smt': ("default SMT core", None, True),
+    'seed_1': ("SMT core, random_seed 1", None, True),
+    'seed_2': ("SMT core, random_seed 2", None, True),
+    'sat': ("simplify, bit-blast and the SAT solver", ("bool", "bitvec"), False),
+    'qf_fd': ("finite-domain solver (SolverFor('QF_FD'))", None, True),
+    'parallel': ("SMT core with one thread per core", None, True),
+}
+# The configurations a Portfolio races.
+RACE_CONFIGS = [name for name, (_, _, incremental) in SOLVER_CONFIGS.items() if incremental]
+
+def make_solver(config=None):
+    """
+    A fresh solver for one of SOLVER_CONFIGS (None means 'smt').
+    """
+    if config is None or config == "smt":
+        return Solver()
+    if config not in SOLVER_CONFIGS:
+        raise ValueError(f"unknown solver config {config!r}; expected one of "
+                         f"{tuple(SOLVER_CONFIGS)}")
+    if config.startswith("seed_"):
+        solver = Solver()
+        solver.set("random_seed", int(config[len("seed_"):]))
+        return solver
+    if config == "sat":
+        # Not incremental: every check re-runs the pipeline on all assertions,
+        # so enumerations slow down with each blocked solution.
+        return Then("simplify", "propagate-values", "solve-eqs", "bit-blast", "sat").solver()
+    if config == "qf_fd":
+        return SolverFor("QF_FD")
+    # A solver parameter rather than the global parallel.enable, which
+    # would also switch on threads for every later solver in the process.
+    solver = Solver()
+    solver.set("threads", os.cpu_count())
+    return solver
+
+def configs_for(encoding, configs=None):
+    """
+    The configurations among configs (default: all) that support encoding.
+    """
+    return [name for name in (configs or SOLVER_CONFIGS)
+            if SOLVER_CONFIGS[name][1] is None or encoding in SOLVER_CONFIGS[name][1]]
+
+def _run_config(args):
+    # Worker entry point: one configuration's attempt at the query. Errors
+    # are returned rather than raised so that another configuration can win.
+    run, config, run_args = args
+    started = time.monotonic()
+    try:
+        return config, run(config, *run_args), None, time.monotonic() - started
+    except Exception as e:
+        return config, None, repr(e), time.monotonic() - started
+
+class Portfolio:
+    """
+    Races solver configurations on one query at a time.
+
+    Parameters:
+      configs    - names from RACE_CONFIGS to race (default: all); those
+                   that do not support a query's encoding are left out
+      workers    - processes per race (default: one per configuration, at
+                   most one per core). With fewer workers than
+                   configurations, the ones that won most often for the
+                   problem class start first.
+      wins_path  - SQLite file the winners are recorded in (see wins)
+    """
+
+    def __init__(self, configs=None, workers=None, wins_path=None):
+        self.configs = list(configs or RACE_CONFIGS)
+        for config in self.configs:
+            if config not in SOLVER_CONFIGS:
+                raise ValueError(f"unknown solver config {config!r}")
+            if config not in RACE_CONFIGS:
+                raise ValueError(f"solver config {config!r} is not incremental and would "
+                                 "stall the enumeration races")
+        self.workers = workers
+        self.wins_path = wins_path
+        # (config, seconds) of the latest race.
+        self.last_winner = None
+
+    def _key(self, problem_class):
+        return cache_key("portfolio_wins", **problem_class)
+
+    def wins(self, problem_class):
+        """
+        {config: number of races won} for problem_class, a dict of
+        JSON-serialisable parameters such as grid size, step count and
+        encoding.
+        """
+        if self.wins_path is None:
+            return {}
+        with ResultCache(self.wins_path) as cache:
+            return cache.get(self._key(problem_class), {})
+
+    def best(self, problem_class, encoding=None):
+        """
+        The configuration that won most often for problem_class, or 'smt'
+        if none has been recorded.
+        """
+        wins = self.wins(problem_class)
+        candidates = configs_for(encoding, self.configs) if encoding else self.configs
+        candidates = [config for config in candidates if config in wins]
+        return max(candidates, key=wins.get) if candidates else "smt"
+
+    def _record(self, problem_class, winner):
+        if self.wins_path is None:
+            return
+        with ResultCache(self.wins_path) as cache:
+            key = self._key(problem_class)
+            wins = cache.get(key, {})
+            wins[winner] = wins.get(winner, 0) + 1
+            cache.put(key, wins)
+
+    def race(self, run, args, problem_class, encoding=None):
+        """
+        Calls run(config, *args) for each configuration in its own process
+        and returns the first result; the other processes are terminated.
+        run must be a picklable module-level function. The winner is kept in
+        last_winner and recorded under problem_class. Raises RuntimeError if
+        every configuration fails.
+        """
+        configs = configs_for(encoding, self.configs) if encoding else list(self.configs)
+        wins = self.wins(problem_class)
+        # Usual winners first, in case not all configurations get a worker.
+        configs.sort(key=lambda config: -wins.get(config, 0))
+        workers = self.workers or min(len(configs), os.cpu_count())
+        # Spawned (not forked) workers start with a clean Z3 state.
+        context = multiprocessing.get_context("spawn")
+        errors = {}
+        with context.Pool(workers) as pool:
+            tasks = [(run, config, args) for config in configs]
+            for config, result, error, seconds in pool.imap_unordered(_run_config, tasks):
+                if error is None:
+                    pool.terminate()
+                    self.last_winner = (config, seconds)
+                    self._record(problem_class, config)
+                    return result
+                errors[config] = error
+        raise RuntimeError(f"every solver config failed: {errors}")
@@ -0,0 +1,104 @@
+"""
+On-disk cache of decided CA constraint queries, so that interrupted or
+re-run searches skip the work they already did.
+
+Entries live in a SQLite file keyed by a hash of the query parameters and
+hold JSON values. Every put is committed immediately, so a crash loses at
+most the query that was running. Long enumerations keep their solutions as
+an item list under their key instead, one row per solution, so that each new
+solution is a single append and a resume streams them back.
+"""
+import hashlib
+import json
+import sqlite3
+
+# Bump when an encoding change alters which solutions a query returns;
+# entries written under another version are then ignored.
+ENCODING_VERSION = 1
+
+def cache_key(kind, **params):
+    """
+    Returns a stable hex key for a query of the given kind (e.g.
+    "neighbor_count" or "multi_layer") with JSON-serialisable params.
+    """
+    payload = json.dumps({'kind': kind, 'version': ENCODING_VERSION, 'params': params},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def neighbor_count_key(start_config, end_config, max_steps, wrap_around, families=False):
+    """
+    Key for a find_all_z3_solutions_neighbor_count style query. Family
+    results (see z3_ca.expand_ruleset_family) are kept under separate keys.
+    """
+    extra = {'families': True} if families else {}
+    return cache_key("neighbor_count", start=start_config, end=end_config,
+                     max_steps=max_steps, wrap_around=wrap_around, **extra)
+
+class ResultCache:
+    """
+    A persistent key -> JSON value store backed by SQLite.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS items (key TEXT NOT NULL, seq INTEGER NOT NULL, "
+            "value TEXT NOT NULL, PRIMARY KEY (key, seq))")
+        self.connection.commit()
+
+    def get(self, key, default=None):
+        row = self.connection.execute(
+            "SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def put(self, key, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)))
+        self.connection.commit()
+
+    def append(self, key, value):
+        """
+        Appends value to the item list under key.
+        """
+        self.extend(key, [value])
+
+    def extend(self, key, values):
+        """
+        Appends values to the item list under key in one transaction.
+        """
+        (count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM items WHERE key = ?", (key,)).fetchone()
+        self.connection.executemany(
+            "INSERT INTO items (key, seq, value) VALUES (?, ?, ?)",
+            ((key, count + i, json.dumps(value)) for i, value in enumerate(values)))
+        self.connection.commit()
+
+    def items(self, key):
+        """
+        Yields the item list under key in order, reading rows as it goes.
+        """
+        cursor = self.connection.execute(
+            "SELECT value FROM items WHERE key = ? ORDER BY seq", (key,))
+        for (value,) in cursor:
+            yield json.loads(value)
+
+    def clear_items(self, key):
+        self.connection.execute("DELETE FROM items WHERE key = ?", (key,))
+        self.connection.commit()
+
+    def __contains__(self, key):
+        return self.connection.execute(
+            "SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
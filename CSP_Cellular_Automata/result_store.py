@@ -0,0 +1,379 @@
+"""
+Compact on-disk store of found patterns, with batch export for the viewers.
+
+Each result is packed into one fixed-width record: the start grid of every
+layer as a bit array, the rule arrays as a value bitmask and a care bitmask
+(clear for the None entries of a ruleset family), the step count and the
+shift. Records are appended to a binary file behind a small JSON header and
+read back as a NumPy memmap, so millions of them can be filtered and
+deduplicated without decoding them into Python objects.
+
+Two kinds of result are stored:
+  - "spaceship": single-layer results of z3_ca.py, dicts with 'seed' (or
+    'start'), 'steps' (or 'max_steps'), 'shift' (or 'shift_x'/'shift_y')
+    and 'ruleset' (or 'rulesets', one record per ruleset);
+  - "walker": the structured walkers of csp_multi_ca/csp_z3.py.
+
+The header also records the grid the search ran on and where the stored
+grids sit in it, since a walker's 3x3 seed only shows its dynamics on that
+grid. export_configs writes viewer-ready config files (carousel.json's
+format for ca.html, getCurrentConfig's for csp_multi_ca/ca.html) on the
+search grid by default, and share_urls builds csp_multi_ca/ca.html links,
+which show a spaceship as a blue-only pattern.
+
+Example:
+    python result_store.py import walkers.jsonl walkers.bin --kind walker --grid-size 3 \
+        --search-grid-size 9 --seed-start 4
+    python result_store.py export walkers.bin --configs viewer/ --urls urls.txt --unique
+"""
+import argparse
+import json
+import os
+import struct
+import urllib.parse
+
+import numpy as np
+
+from z3_ca import pad_grid
+
+MAGIC = b"CARS"
+FORMAT_VERSION = 1
+# kind -> (layers, rule arrays in record order).
+KINDS = {
+    'spaceship': (1, [('ruleset', 'dead'), ('ruleset', 'live')]),
+    'walker': (2, [('blue', 'dead'), ('blue', 'live'), ('orange', 'dead'), ('orange', 'live')]),
+}
+VIEWER_URL = "https://frankbryce.github.io/csp_multi_ca/ca.html"
+
+def record_dtype(kind, grid_size):
+    """
+    The NumPy dtype of one record: 'grids' (layers x packed bytes), 'rules'
+    and 'care' (bit i is rule entry i), 'steps' and 'shift'.
+    """
+    layers, _ = KINDS[kind]
+    grid_bytes = (grid_size * grid_size + 7) // 8
+    return np.dtype([('grids', np.uint8, (layers, grid_bytes)), ('rules', '<u8'),
+                     ('care', '<u8'), ('steps', np.uint8), ('shift', np.int8, (2,))])
+
+def _spaceship_records(result):
+    # Normalises a single-layer result (find_spaceships, the z3_ca.py driver
+    # or a sweep.py line) into one (grid, rulesets, steps, shift) per ruleset.
+    grid = result['seed'] if 'seed' in result else result['start']
+    steps = result['steps'] if 'steps' in result else result['max_steps']
+    shift = result['shift'] if 'shift' in result else [result['shift_x'], result['shift_y']]
+    rulesets = [result['ruleset']] if 'ruleset' in result else result['rulesets']
+    return [([grid], [ruleset['dead'], ruleset['live']], steps, shift) for ruleset in rulesets]
+
+def _walker_records(result):
+    return [([result['seed_blue'], result['seed_orange']],
+             [result['blue']['dead'], result['blue']['live'],
+              result['orange']['dead'], result['orange']['live']],
+             result['period'], result['offset'])]
+
+class ResultStore:
+    """
+    An append-only file of packed results of one kind and grid size.
+
+    Parameters:
+      kind             - "spaceship" or "walker"
+      grid_size        - side of the stored grids; smaller grids are centred
+                         as pad_grid does
+      search_grid_size - side of the grid the search ran on (default:
+                         grid_size)
+      seed_start       - row and column of the stored grids' top-left cell
+                         on the search grid (default: centred)
+
+    Opening an existing file reads these from its header; creating one needs
+    kind and grid_size.
+    """
+
+    def __init__(self, path, kind=None, grid_size=None, search_grid_size=None, seed_start=None):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                magic, header_size = struct.unpack("<4sI", f.read(8))
+                if magic != MAGIC:
+                    raise ValueError(f"{path} is not a result store")
+                header = json.loads(f.read(header_size))
+            if header['version'] != FORMAT_VERSION:
+                raise ValueError(f"{path} has store format {header['version']}, "
+                                 f"expected {FORMAT_VERSION}")
+            if kind is not None and kind != header['kind']:
+                raise ValueError(f"{path} holds {header['kind']} records, not {kind}")
+            if grid_size is not None and grid_size != header['grid_size']:
+                raise ValueError(f"{path} holds {header['grid_size']}x{header['grid_size']} "
+                                 f"grids, not {grid_size}x{grid_size}")
+            self.kind = header['kind']
+            self.grid_size = header['grid_size']
+            self.search_grid_size = header['search_grid_size']
+            self.seed_start = header['seed_start']
+            self.offset = 8 + header_size
+        else:
+            if kind not in KINDS or grid_size is None:
+                raise ValueError(f"a new store needs a kind from {tuple(KINDS)} and a grid_size")
+            self.kind = kind
+            self.grid_size = grid_size
+            self.search_grid_size = search_grid_size or grid_size
+            if seed_start is None:
+                seed_start = (self.search_grid_size - grid_size) // 2
+            if seed_start < 0 or seed_start + grid_size > self.search_grid_size:
+                raise ValueError(f"a {grid_size}x{grid_size} grid at {seed_start} does not fit "
+                                 f"the {self.search_grid_size}x{self.search_grid_size} search grid")
+            self.seed_start = seed_start
+            header = json.dumps({'version': FORMAT_VERSION, 'kind': kind, 'grid_size': grid_size,
+                                 'search_grid_size': self.search_grid_size,
+                                 'seed_start': seed_start}).encode()
+            # Pad the header so that records start 8-byte aligned.
+            header += b" " * (-(8 + len(header)) % 8)
+            with open(path, "wb") as f:
+                f.write(struct.pack("<4sI", MAGIC, len(header)) + header)
+            self.offset = 8 + len(header)
+        self.dtype = record_dtype(self.kind, self.grid_size)
+        self.layers, self.rule_arrays = KINDS[self.kind]
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - self.offset) // self.dtype.itemsize
+
+    def pack(self, result):
+        """
+        The records (a NumPy array) for one result; a single-layer result
+        with several rulesets gives one record per ruleset.
+        """
+        parts = _spaceship_records(result) if self.kind == "spaceship" else _walker_records(result)
+        records = np.zeros(len(parts), dtype=self.dtype)
+        for record, (grids, rule_arrays, steps, shift) in zip(records, parts):
+            for layer, grid in enumerate(grids):
+                if len(grid) > self.grid_size:
+                    raise ValueError(f"a {len(grid)}x{len(grid)} grid does not fit the store's "
+                                     f"{self.grid_size}x{self.grid_size} records")
+                cells = np.array(pad_grid(grid, target_size=self.grid_size), dtype=np.uint8)
+                record['grids'][layer] = np.packbits(cells.ravel(), bitorder="little")
+            rules = care = 0
+            entries = [bit for rule_array in rule_arrays for bit in rule_array]
+            for i, bit in enumerate(entries):
+                # None marks a don't-care entry of a ruleset family.
+                if bit is not None:
+                    care |= 1 << i
+                    rules |= bit << i
+            record['rules'], record['care'] = rules, care
+            record['steps'] = steps
+            record['shift'] = shift
+        return records
+
+    def add(self, result):
+        """
+        Appends the records of one result.
+        """
+        self.add_records(self.pack(result))
+
+    def add_records(self, records):
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(records, dtype=self.dtype).tobytes())
+
+    def records(self):
+        """
+        All records as a read-only memmap (an empty array for an empty
+        store). Records appended later need a new call.
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=self.offset,
+                         shape=(len(self),))
+
+    def unpack(self, record):
+        """
+        A record as a result dict in the shape its search reports, with the
+        grids at the store's size.
+        """
+        n = self.grid_size
+        grids = [np.unpackbits(record['grids'][layer], count=n * n,
+                               bitorder="little").reshape(n, n).tolist()
+                 for layer in range(self.layers)]
+        rules, care = int(record['rules']), int(record['care'])
+        bits = [(rules >> i) & 1 if (care >> i) & 1 else None
+                for i in range(9 * len(self.rule_arrays))]
+        arrays = {}
+        for k, (layer, kind) in enumerate(self.rule_arrays):
+            arrays.setdefault(layer, {})[kind] = bits[9 * k:9 * k + 9]
+        steps, shift = int(record['steps']), [int(v) for v in record['shift']]
+        if self.kind == "spaceship":
+            return {'seed': grids[0], 'steps': steps, 'shift': shift,
+                    'ruleset': arrays['ruleset']}
+        return {'seed_blue': grids[0], 'seed_orange': grids[1], 'blue': arrays['blue'],
+                'orange': arrays['orange'], 'period': steps, 'offset': shift}
+
+    def get(self, index):
+        return self.unpack(self.records()[index])
+
+    def find(self, steps=None, shift=None, result=None):
+        """
+        Indices of the records with the given step count, shift, or exact
+        contents of result (e.g. a ruleset to look up with its seed),
+        evaluated on the memmap.
+        """
+        records = self.records()
+        keep = np.ones(len(records), dtype=bool)
+        if steps is not None:
+            keep &= records['steps'] == steps
+        if shift is not None:
+            keep &= (records['shift'] == np.array(shift, dtype=np.int8)).all(axis=1)
+        if result is not None:
+            wanted = self.pack(result)
+            raw = records.view(np.dtype((np.void, self.dtype.itemsize)))
+            keep &= np.isin(raw, wanted.view(np.dtype((np.void, self.dtype.itemsize))))
+        return np.flatnonzero(keep)
+
+    def unique(self):
+        """
+        Indices of the first copy of every distinct record, in store order.
+        """
+        records = self.records()
+        if len(records) == 0:
+            return np.zeros(0, dtype=np.int64)
+        raw = records.view(np.dtype((np.void, self.dtype.itemsize)))
+        _, first = np.unique(raw, return_index=True)
+        return np.sort(first)
+
+def _filled(ruleset):
+    # The viewers need concrete rulesets; don't-care entries become 0.
+    return {kind: [0 if bit is None else bit for bit in ruleset[kind]]
+            for kind in ['dead', 'live']}
+
+def place(store, grid, view_size=None):
+    """
+    A stored grid at its place on the search grid, as a view_size x
+    view_size grid (default: the search grid's size); a different view_size
+    keeps the search grid centred.
+    """
+    view_size = view_size or store.search_grid_size
+    start = store.seed_start + (view_size - store.search_grid_size) // 2
+    if start < 0 or start + store.grid_size > view_size:
+        raise ValueError(f"a {view_size}x{view_size} view does not hold the stored grids")
+    placed = [[0] * view_size for _ in range(view_size)]
+    for r, row in enumerate(pad_grid(grid, target_size=store.grid_size)):
+        placed[start + r][start:start + store.grid_size] = row
+    return placed
+
+def viewer_config(store, result, view_size=None, wrap_around=False):
+    """
+    The config a viewer loads for one unpacked result: carousel.json's
+    {gridSize, grid, wrapAround} (plus its rulesets) for a spaceship, and
+    csp_multi_ca/ca.html's compact gridBlue/gridOrange config for a walker.
+    The grids are placed as the search saw them (see place).
+    """
+    if store.kind == "spaceship":
+        grid = place(store, result['seed'], view_size)
+        return {'gridSize': len(grid), 'grid': grid, 'wrapAround': wrap_around,
+                'rulesets': [_filled(result['ruleset'])]}
+    return multi_layer_config([place(store, result['seed_blue'], view_size),
+                               place(store, result['seed_orange'], view_size)],
+                              [result['blue'], result['orange']], wrap_around)
+
+def multi_layer_config(grids, rulesets, wrap_around=False):
+    """
+    csp_multi_ca/ca.html's config for blue and orange grids of the same
+    size (an empty orange layer if only one is given) and their rulesets.
+    """
+    view_size = len(grids[0])
+    blue, orange = (grids + [[[0] * view_size for _ in range(view_size)]])[:2]
+    encode = lambda grid: "".join(str(cell) for row in grid for cell in row)
+    rulesets = [_filled(ruleset) for ruleset in rulesets]
+    return {'gridSize': view_size, 'gridBlue': encode(blue), 'gridOrange': encode(orange),
+            'wrapAround': wrap_around, 'currentBlueRulesetIndex': 0,
+            'currentOrangeRulesetIndex': len(rulesets) - 1, 'rulesets': rulesets}
+
+def share_url(config, base_url=VIEWER_URL):
+    """
+    The csp_multi_ca/ca.html link that opens a config, as copyStateUrl
+    builds it.
+    """
+    # Quoted as encodeURIComponent(JSON.stringify(config)) would be.
+    return base_url + "?config=" + urllib.parse.quote(json.dumps(config, separators=(",", ":")),
+                                                      safe="-_.!~*'()")
+
+def export_configs(store, directory, indices=None, view_size=None, wrap_around=False):
+    """
+    Writes one viewer config file per record (all, or those in indices) to
+    directory as <index>.json, formatted like carousel.json. Returns the
+    paths written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    records = store.records()
+    indices = range(len(records)) if indices is None else indices
+    paths = []
+    for index in indices:
+        config = viewer_config(store, store.unpack(records[index]), view_size, wrap_around)
+        path = os.path.join(directory, f"{int(index):07d}.json")
+        with open(path, "w") as f:
+            json.dump(config, f, indent=2)
+        paths.append(path)
+    return paths
+
+def share_urls(store, indices=None, view_size=None, wrap_around=False, base_url=VIEWER_URL):
+    """
+    Yields (index, csp_multi_ca/ca.html link) for every record (all, or
+    those in indices).
+    """
+    records = store.records()
+    indices = range(len(records)) if indices is None else indices
+    for index in indices:
+        result = store.unpack(records[index])
+        if store.kind == "spaceship":
+            config = multi_layer_config([place(store, result['seed'], view_size)],
+                                        [result['ruleset']], wrap_around)
+        else:
+            config = viewer_config(store, result, view_size, wrap_around)
+        yield int(index), share_url(config, base_url)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("import", help="pack a JSONL file of results into a store")
+    pack.add_argument("jsonl")
+    pack.add_argument("store")
+    pack.add_argument("--kind", choices=list(KINDS), default=None,
+                      help="needed when the store does not exist yet")
+    pack.add_argument("--grid-size", type=int, default=None,
+                      help="side of the stored grids; needed when the store does not exist yet")
+    pack.add_argument("--search-grid-size", type=int, default=None,
+                      help="side of the grid the search ran on (default: --grid-size)")
+    pack.add_argument("--seed-start", type=int, default=None,
+                      help="row and column of the stored grids on the search grid "
+                           "(default: centred)")
+    export = commands.add_parser("export", help="write viewer configs and share links")
+    export.add_argument("store")
+    export.add_argument("--configs", default=None, help="directory for the config files")
+    export.add_argument("--urls", default=None, help="file for the share links, one per line")
+    export.add_argument("--unique", action="store_true", help="skip duplicate records")
+    export.add_argument("--steps", type=int, default=None, help="only this step count / period")
+    export.add_argument("--view-size", type=int, default=None,
+                        help="viewer grid side (default: the search grid's side)")
+    export.add_argument("--wrap-around", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        store = ResultStore(args.store, args.kind, args.grid_size, args.search_grid_size,
+                            args.seed_start)
+        added = len(store)
+        with open(args.jsonl) as f:
+            for line in f:
+                if line.strip():
+                    store.add(json.loads(line))
+        print(f"{len(store) - added} record(s) added; {len(store)} in {args.store}")
+        return
+
+    store = ResultStore(args.store)
+    indices = store.unique() if args.unique else np.arange(len(store))
+    if args.steps is not None:
+        indices = np.intersect1d(indices, store.find(steps=args.steps))
+    if args.configs:
+        paths = export_configs(store, args.configs, indices, args.view_size, args.wrap_around)
+        print(f"{len(paths)} config(s) written to {args.configs}")
+    if args.urls:
+        with open(args.urls, "w") as f:
+            for index, url in share_urls(store, indices, args.view_size, args.wrap_around):
+                f.write(url + "\n")
+        print(f"{len(indices)} link(s) written to {args.urls}")
+
+if __name__ == "__main__":
+    main()
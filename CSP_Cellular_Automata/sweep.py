@@ -0,0 +1,191 @@
+"""
+Headless, parallel version of the shift sweep in z3_ca.py.
+
+Every (n_ones, steps, symmetry class) job is handed to a process pool and
+its result is appended to a JSONL file as soon as it is known, so the sweep
+can run unattended. Each line holds the start grid that was solved, every
+equivalent (start grid, shift) job, and the rulesets in the
+{'dead': [...], 'live': [...]} shape that ca.html loads.
+
+With --cache, decided jobs (sat or unsat, not timed out) are also recorded
+in a SQLite result cache and skipped when the sweep is run again, so an
+interrupted sweep resumes where it stopped.
+
+Example:
+    python sweep.py --output results.jsonl --workers 8 --timeout 600 --cache sweep.db
+"""
+import argparse
+import json
+import multiprocessing
+import os
+
+from ca_symmetry import generate_grids_with_n_ones, group_equivalent_jobs
+from result_cache import ResultCache, neighbor_count_key
+from z3_ca import (ENCODINGS, CAUnrolling, SolverTimeout, light_cone_grid_size, pad_grid,
+                   shift_grid)
+
+# One CAUnrolling per (grid size, steps, wrap_around, encoding, seed window),
+# private to each worker process so that every worker owns its own Z3 context.
+_unrollings = {}
+
+def generate_jobs(n_ones_values, steps_values, shifts, seed_size=3, target_size=9,
+                  wrap_around=False):
+    """
+    Yields one job dict per symmetry class of (padded seed, shift) for every
+    n_ones and step count, in the same order as the z3_ca.py sweep. A
+    target_size of None picks the light-cone grid size for each step count.
+    Each job records the padded seed window so that the z3 engine only
+    encodes cells inside its light cone.
+    """
+    for n_ones in n_ones_values:
+        candidate_grids = generate_grids_with_n_ones(n_ones, seed_size)
+        for max_steps in steps_values:
+            grid_size = target_size or light_cone_grid_size(seed_size, max_steps)
+            # pad_grid centres the seed window.
+            offset = (grid_size - seed_size) // 2
+            seed_window = (offset, offset, offset + seed_size - 1, offset + seed_size - 1)
+            jobs = [(pad_grid(candidate, target_size=grid_size), shift_x, shift_y)
+                    for shift_x, shift_y in shifts for candidate in candidate_grids]
+            for job_class in group_equivalent_jobs(jobs, max_steps, wrap_around):
+                start_config, shift_x, shift_y = job_class[0]
+                yield {
+                    'n_ones': n_ones,
+                    'max_steps': max_steps,
+                    'wrap_around': wrap_around,
+                    'seed_window': seed_window,
+                    'start': start_config,
+                    'shift_x': shift_x,
+                    'shift_y': shift_y,
+                    'equivalent': [{'start': g, 'shift_x': sx, 'shift_y': sy}
+                                   for g, sx, sy in job_class],
+                }
+
+def run_job(job, engine="z3", encoding="bool", timeout=None, families=False):
+    """
+    Solves one job and returns it with 'status' ("sat", "unsat" or
+    "timeout") and 'rulesets' filled in. On timeout, 'rulesets' holds
+    whatever was found before the deadline. With families, the z3 engine
+    reports ruleset families with None for don't-care entries; the numpy
+    engine only finds single rulesets and rejects families.
+    """
+    if engine == "numpy" and families:
+        raise ValueError("the numpy engine cannot report ruleset families")
+    start_config = job['start']
+    end_config = shift_grid(start_config, job['shift_x'], job['shift_y'])
+    if engine == "numpy":
+        from ca_numpy import find_all_numpy_solutions_neighbor_count
+        rulesets = find_all_numpy_solutions_neighbor_count(
+            start_config, end_config, job['max_steps'], job['wrap_around'])
+        status = "sat" if rulesets else "unsat"
+    else:
+        key = (len(start_config), job['max_steps'], job['wrap_around'], encoding,
+               tuple(job['seed_window']))
+        if key not in _unrollings:
+            _unrollings[key] = CAUnrolling(*key)
+        try:
+            rulesets = _unrollings[key].find_all_solutions(start_config, end_config, timeout,
+                                                           families)
+            status = "sat" if rulesets else "unsat"
+        except SolverTimeout as e:
+            rulesets = e.solutions
+            status = "timeout"
+    return dict(job, status=status, rulesets=rulesets)
+
+def _run_job_star(args):
+    return run_job(*args)
+
+def job_key(job, families=False):
+    """
+    Result cache key for a job.
+    """
+    end_config = shift_grid(job['start'], job['shift_x'], job['shift_y'])
+    return neighbor_count_key(job['start'], end_config, job['max_steps'], job['wrap_around'],
+                              families)
+
+def run_sweep(jobs, output_path, workers=None, engine="z3", encoding="bool", timeout=None,
+              cache=None, families=False):
+    """
+    Runs jobs on a pool of worker processes and appends one JSON line per
+    finished job to output_path, flushing after every line. If cache (a
+    ResultCache) is given, jobs it already holds are skipped and newly
+    decided jobs are added to it. Returns the number of jobs that had at
+    least one ruleset, counting those answered from the cache.
+    """
+    if engine == "numpy" and families:
+        # Its plain rulesets would be cached under the families key.
+        raise ValueError("the numpy engine cannot report ruleset families")
+    workers = workers or os.cpu_count()
+    found_count = 0
+    if cache is not None:
+        # Filtered up front: the pool consumes its task iterator from another
+        # thread, and the SQLite connection belongs to this one.
+        pending = []
+        for job in jobs:
+            cached = cache.get(job_key(job, families))
+            if cached is None:
+                pending.append(job)
+            elif cached['rulesets']:
+                found_count += len(job['equivalent'])
+        jobs = pending
+    # Spawned (not forked) workers start with a clean Z3 state.
+    context = multiprocessing.get_context("spawn")
+    with open(output_path, "a") as out, context.Pool(workers) as pool:
+        tasks = ((job, engine, encoding, timeout, families) for job in jobs)
+        for result in pool.imap_unordered(_run_job_star, tasks):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if cache is not None and result['status'] != "timeout":
+                cache.put(job_key(result, families),
+                          {'status': result['status'], 'rulesets': result['rulesets']})
+            if result['rulesets']:
+                found_count += len(result['equivalent'])
+    return found_count
+
+def _int_range(text):
+    """
+    Parses "a:b" (inclusive) or a single integer into a range.
+    """
+    first, _, last = text.partition(":")
+    return range(int(first), int(last or first) + 1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="sweep_results.jsonl",
+                        help="JSONL file that results are appended to")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed per job (default: no limit)")
+    parser.add_argument("--engine", choices=["z3", "numpy"], default="z3")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="bool")
+    parser.add_argument("--n-ones", type=_int_range, default=_int_range("1:9"))
+    parser.add_argument("--steps", type=_int_range, default=_int_range("2:4"))
+    parser.add_argument("--shift-x", type=_int_range, default=_int_range("0:2"))
+    parser.add_argument("--shift-y", type=_int_range, default=_int_range("1:2"))
+    parser.add_argument("--seed-size", type=int, default=3)
+    parser.add_argument("--target-size", type=lambda text: None if text == "auto" else int(text),
+                        default=9, help='padded grid size, or "auto" for the light-cone size')
+    parser.add_argument("--wrap-around", action="store_true")
+    parser.add_argument("--families", action="store_true",
+                        help="report ruleset families with null for don't-care entries "
+                             "(z3 engine only)")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite result cache; decided jobs in it are skipped")
+    args = parser.parse_args(argv)
+    if args.families and args.engine == "numpy":
+        parser.error("--families needs the z3 engine")
+
+    shifts = [(sx, sy) for sx in args.shift_x for sy in args.shift_y]
+    jobs = generate_jobs(args.n_ones, args.steps, shifts, args.seed_size,
+                         args.target_size, args.wrap_around)
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        found_count = run_sweep(jobs, args.output, args.workers, args.engine,
+                                args.encoding, args.timeout, cache, args.families)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Total candidates with solutions: {found_count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Instrumentation and limits for long-running solver searches.
+
+A SolverTelemetry is handed to CAUnrolling (z3_ca.py) or WalkerSearch
+(csp_multi_ca/csp_z3.py), which then run every solver check() through it.
+Each check becomes one 'check' event with its result, latency, the time
+since the previous sat result, peak resident memory and the solver's Z3
+statistics. While a search runs, a background thread adds a 'progress' event
+every progress_interval seconds, including how long the current check has
+been running, so a slow query can be told from a hung one. Events are
+appended to a JSONL file, passed to a callback, or both.
+
+Limits end a search cleanly: a check that runs out of time or memory returns
+unknown, and the search reports what it found so far. query_timeout bounds
+each check; total_timeout and max_memory_mb bound the whole search and, once
+reached, set stopped and turn every further check into unknown.
+"""
+import json
+import resource
+import threading
+import time
+
+from z3 import sat, unknown
+
+# Z3's default "timeout", i.e. none.
+NO_TIMEOUT = 4294967295
+
+def peak_rss_kb():
+    """
+    Peak resident memory of this process so far, in KB (Linux units).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def z3_statistics(solver):
+    """
+    A solver's statistics as a plain dict.
+    """
+    statistics = solver.statistics()
+    return {key: statistics.get_key_value(key) for key in statistics.keys()}
+
+class SolverTelemetry:
+    """
+    Records the solver checks of one search and enforces its limits.
+
+    Parameters:
+      path              - JSONL file events are appended to
+      callback          - called with every event dict
+      label             - added to every event, e.g. to tell subproblems apart
+      progress_interval - seconds between 'progress' events (default: none)
+      progress_stream   - if given, progress events are also printed to it
+      query_timeout     - seconds allowed per check
+      total_timeout     - seconds allowed for the whole search, counted from
+                          the creation of this object
+      max_memory_mb     - peak resident memory at which the search stops; a
+                          running check is interrupted
+      statistics        - if False, check events leave out the Z3
+                          statistics
+    """
+
+    def __init__(self, path=None, callback=None, label=None, progress_interval=None,
+                 progress_stream=None, query_timeout=None, total_timeout=None,
+                 max_memory_mb=None, statistics=True):
+        self.callback = callback
+        self.label = label
+        self.progress_interval = progress_interval
+        self.progress_stream = progress_stream
+        self.query_timeout = query_timeout
+        self.total_timeout = total_timeout
+        self.max_memory_mb = max_memory_mb
+        self.statistics = statistics
+        self.started = time.monotonic()
+        self.checks = 0
+        self.sat_checks = 0
+        self.last_sat = self.started
+        # Why the whole search ended early ("total_timeout" or "memory"), or None.
+        self.stopped = None
+        # Why the latest check returned unknown, or None.
+        self.last_reason = None
+        self._out = open(path, "a") if path else None
+        self._lock = threading.Lock()
+        # (solver, start time) of the check in progress.
+        self._running = None
+        self._memory_interrupt = False
+        self._done = threading.Event()
+        self._monitor = None
+        if progress_interval or max_memory_mb:
+            self._monitor = threading.Thread(target=self._watch, daemon=True)
+            self._monitor.start()
+
+    def _emit(self, event):
+        event = dict(event, label=self.label, elapsed=time.monotonic() - self.started)
+        with self._lock:
+            if self._out is not None:
+                self._out.write(json.dumps(event) + "\n")
+                self._out.flush()
+            if self.callback is not None:
+                self.callback(event)
+
+    def _over_memory(self):
+        return self.max_memory_mb is not None and peak_rss_kb() > self.max_memory_mb * 1024
+
+    def _watch(self):
+        # Progress events and the memory limit, while checks block the caller.
+        interval = self.progress_interval or 1.0
+        next_progress = time.monotonic() + interval
+        while not self._done.wait(min(interval, 1.0)):
+            running = self._running
+            if running is not None and self._over_memory():
+                self._memory_interrupt = True
+                running[0].interrupt()
+            if self.progress_interval and time.monotonic() >= next_progress:
+                next_progress += interval
+                self.progress(running)
+
+    def progress(self, running=None):
+        """
+        Emits a 'progress' event (and prints it to progress_stream).
+        """
+        now = time.monotonic()
+        event = {
+            'event': "progress",
+            'checks': self.checks,
+            'sat_checks': self.sat_checks,
+            'since_last_sat': now - self.last_sat,
+            'running_check_seconds': None if running is None else now - running[1],
+            'peak_rss_kb': peak_rss_kb(),
+        }
+        self._emit(event)
+        if self.progress_stream is not None:
+            current = ("idle" if running is None
+                       else f"current check running {event['running_check_seconds']:.0f}s")
+            print(f"[{self.label or 'search'}] {now - self.started:.0f}s: {self.checks} checks, "
+                  f"{self.sat_checks} sat, {event['peak_rss_kb'] // 1024} MB, {current}",
+                  file=self.progress_stream, flush=True)
+
+    def _stop(self, reason):
+        self.stopped = reason
+        self._emit({'event': "stopped", 'reason': reason, 'checks': self.checks,
+                    'sat_checks': self.sat_checks, 'peak_rss_kb': peak_rss_kb()})
+
+    def check(self, solver, *assumptions, timeout=None):
+        """
+        solver.check(*assumptions) within the tightest of timeout (seconds,
+        the caller's own budget), query_timeout and what is left of
+        total_timeout. Returns unknown without checking once the search has
+        stopped; last_reason says why a check returned unknown.
+        """
+        if self.stopped is None:
+            if self._over_memory():
+                self._stop("memory")
+            elif (self.total_timeout is not None and
+                  time.monotonic() - self.started >= self.total_timeout):
+                self._stop("total_timeout")
+        if self.stopped is not None:
+            self.last_reason = self.stopped
+            return unknown
+
+        limits = {'timeout': timeout, 'query_timeout': self.query_timeout}
+        if self.total_timeout is not None:
+            limits['total_timeout'] = self.total_timeout - (time.monotonic() - self.started)
+        limits = {name: seconds for name, seconds in limits.items() if seconds is not None}
+        binding = min(limits, key=limits.get) if limits else None
+        solver.set("timeout", max(1, int(limits[binding] * 1000)) if binding else NO_TIMEOUT)
+
+        started = time.monotonic()
+        self._memory_interrupt = False
+        self._running = (solver, started)
+        try:
+            result = solver.check(*assumptions)
+        finally:
+            self._running = None
+        now = time.monotonic()
+        self.checks += 1
+        event = {'event': "check", 'check': self.checks, 'result': str(result),
+                 'seconds': now - started}
+        self.last_reason = None
+        if result == unknown:
+            reason = solver.reason_unknown()
+            if self._memory_interrupt:
+                self.last_reason = "memory"
+            elif reason in ("timeout", "canceled") and binding is not None:
+                self.last_reason = binding
+            else:
+                self.last_reason = reason
+            event['reason'] = self.last_reason
+        elif result == sat:
+            event['since_last_sat'] = now - self.last_sat
+            self.sat_checks += 1
+            self.last_sat = now
+        event['peak_rss_kb'] = peak_rss_kb()
+        if self.statistics:
+            event['statistics'] = z3_statistics(solver)
+        self._emit(event)
+        if self.last_reason in ("memory", "total_timeout"):
+            self._stop(self.last_reason)
+        return result
+
+    def close(self):
+        """
+        Stops the progress thread and closes the event file.
+        """
+        self._done.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
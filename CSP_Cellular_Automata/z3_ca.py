@@ -1,6 +1,14 @@
 from z3 import *
+import itertools
 import json
-import itertools  # Needed for iterating over candidate grids.
+import sys
+import time
+
+from ca_encoding import (bitvec_count, count_indicators, neighbor_cells, neighbor_rows,
+                         neighbor_table, one_hot_count, row_value, rule_lanes,
+                         select_rule_indicators, select_rule_lanes, select_rule_one_hot,
+                         shift_row)
+from portfolio import make_solver
 
 try:
     import pyperclip
@@ -8,24 +16,46 @@ try:
 except ImportError:
     clipboard_available = False
 
-def select_rule(neighbor_count, rule_list):
+ENCODINGS = ("int", "bool", "bitvec")
+
+class SolverTimeout(Exception):
     """
-    Constructs an expression that selects the appropriate rule value
-    based on the neighbor_count.
-    rule_list should be a list of 9 Z3 Int variables.
+    Raised when a query runs out of time before its enumeration finished.
+    solutions holds the rulesets found up to that point.
     """
-    expr = If(neighbor_count == 0, rule_list[0],
-           If(neighbor_count == 1, rule_list[1],
-           If(neighbor_count == 2, rule_list[2],
-           If(neighbor_count == 3, rule_list[3],
-           If(neighbor_count == 4, rule_list[4],
-           If(neighbor_count == 5, rule_list[5],
-           If(neighbor_count == 6, rule_list[6],
-           If(neighbor_count == 7, rule_list[7],
-                rule_list[8]))))))))
-    return expr
-
-def find_all_z3_solutions_neighbor_count(start_config, end_config, max_steps, wrap_around=False):
+
+    def __init__(self, solutions):
+        super().__init__(f"timed out after {len(solutions)} solution(s)")
+        self.solutions = solutions
+
+def used_rule_entries(trajectory, wrap_around=False):
+    """
+    Returns the set of ('dead' | 'live', neighbor_count) rule entries that are
+    consulted while stepping through trajectory, a list of consecutive grid
+    states. Rule entries outside this set cannot change the trajectory.
+    """
+    used = set()
+    grid_size = len(trajectory[0])
+    for grid in trajectory[:-1]:
+        for r in range(grid_size):
+            for c in range(grid_size):
+                count = sum(grid[rr][cc] for rr, cc in neighbor_cells(r, c, grid_size, wrap_around))
+                used.add(('live' if grid[r][c] else 'dead', count))
+    return used
+
+def expand_ruleset_family(family):
+    """
+    Yields every concrete ruleset in a ruleset family, i.e. a ruleset whose
+    'dead'/'live' entries may be None for "either 0 or 1".
+    """
+    entries = family['dead'] + family['live']
+    choices = [[0, 1] if bit is None else [bit] for bit in entries]
+    for bits in itertools.product(*choices):
+        yield {'dead': list(bits[:9]), 'live': list(bits[9:])}
+
+def find_all_z3_solutions_neighbor_count(start_config, end_config, max_steps, wrap_around=False,
+                                         encoding="int", families=False, light_cone=False,
+                                         telemetry=None, portfolio=None):
     """
     Uses Z3 to search for all rulesets (neighbor count based) that transform
     start_config to end_config within max_steps.
@@ -35,12 +65,48 @@ def find_all_z3_solutions_neighbor_count(start_config, end_config, max_steps, wr
       end_config    - a 2D list representing the target grid state (0 or 1)
       max_steps     - number of simulation steps allowed
       wrap_around   - if True, use toroidal (wrap-around) neighbor calculation
+      encoding      - "int" models cells and rule bits as 0/1 Ints with
+                      arithmetic neighbor sums; "bool" models them as Bools
+                      with unary-counter neighbor counts; "bitvec" packs each
+                      row into a BitVec (see CAUnrolling). All return the
+                      same rulesets.
+      families      - if True, return ruleset families instead: rule entries
+                      that the trajectory never consults are None (either
+                      value works), and each family costs a single solver
+                      call. expand_ruleset_family lists the concrete rulesets.
+      light_cone    - if True, only cells inside start_config's light cone
+                      get variables (see CAUnrolling); same rulesets.
+      telemetry     - a telemetry.SolverTelemetry that records every
+                      solver check and applies its limits; SolverTimeout
+                      carries the rulesets found when a limit is hit.
+      portfolio     - a portfolio.Portfolio: the query is raced under its
+                      solver configurations in parallel processes and the
+                      first to finish answers. Cannot be combined with
+                      telemetry.
 
     Returns:
       A list of valid rulesets, where each ruleset is a dict with keys:
           'dead': [...],
           'live': [...]
     """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+    if portfolio is not None:
+        if telemetry is not None:
+            raise ValueError("a portfolio race cannot be combined with telemetry")
+        problem_class = dict(query="neighbor_count", grid_size=len(start_config),
+                             max_steps=max_steps, wrap_around=wrap_around, encoding=encoding,
+                             families=families)
+        return portfolio.race(_solve_with_config,
+                              (start_config, end_config, max_steps, wrap_around, encoding,
+                               families, light_cone),
+                              problem_class, encoding)
+    if encoding != "int" or families or light_cone or telemetry is not None:
+        seed_window = live_window(start_config) if light_cone else None
+        unrolling = CAUnrolling(len(start_config), max_steps, wrap_around, encoding=encoding,
+                                seed_window=seed_window, telemetry=telemetry)
+        return unrolling.find_all_solutions(start_config, end_config, families=families)
+
     grid_size = len(start_config)
     solver = Solver()
 
@@ -79,29 +145,19 @@ def find_all_z3_solutions_neighbor_count(start_config, end_config, max_steps, wr
             solver.add(grid_vars[max_steps][(r, c)] == end_config[r][c])
     
     # Transition constraints: Define how the grid evolves following the ruleset.
+    neighbors_of = neighbor_table(grid_size, wrap_around)
     for t in range(max_steps):
         for r in range(grid_size):
             for c in range(grid_size):
-                neighbors = []
-                for dr in [-1, 0, 1]:
-                    for dc in [-1, 0, 1]:
-                        if dr == 0 and dc == 0:
-                            continue  # Skip the cell itself.
-                        rr = r + dr
-                        cc = c + dc
-                        if wrap_around:
-                            rr = (rr + grid_size) % grid_size
-                            cc = (cc + grid_size) % grid_size
-                            neighbors.append(grid_vars[t][(rr, cc)])
-                        else:
-                            if 0 <= rr < grid_size and 0 <= cc < grid_size:
-                                neighbors.append(grid_vars[t][(rr, cc)])
+                neighbors = [grid_vars[t][cell] for cell in neighbors_of[r][c]]
                 neighbor_sum = Sum(neighbors) if neighbors else 0
+                # The count is decoded once and read by both rule arrays.
+                indicators = count_indicators(neighbor_sum)
                 current_cell = grid_vars[t][(r, c)]
                 next_cell = grid_vars[t+1][(r, c)]
                 expected_next = If(current_cell == 0,
-                                   select_rule(neighbor_sum, rule_dead_vars),
-                                   select_rule(neighbor_sum, rule_live_vars))
+                                   select_rule_indicators(indicators, rule_dead_vars),
+                                   select_rule_indicators(indicators, rule_live_vars))
                 solver.add(next_cell == expected_next)
     
     solutions = []
@@ -123,6 +179,447 @@ def find_all_z3_solutions_neighbor_count(start_config, end_config, max_steps, wr
     
     return solutions
 
+def _solve_with_config(solver_config, start_config, end_config, max_steps, wrap_around,
+                       encoding, families, light_cone):
+    # One portfolio entry of find_all_z3_solutions_neighbor_count.
+    seed_window = live_window(start_config) if light_cone else None
+    unrolling = CAUnrolling(len(start_config), max_steps, wrap_around, encoding=encoding,
+                            seed_window=seed_window, solver_config=solver_config)
+    return unrolling.find_all_solutions(start_config, end_config, families=families)
+
+def live_window(grid):
+    """
+    Returns the bounding box (top, left, bottom, right), inclusive, of the
+    live cells in grid, or None if the grid is empty.
+    """
+    cells = [(r, c) for r, row in enumerate(grid) for c, v in enumerate(row) if v]
+    if not cells:
+        return None
+    rows = [r for r, _ in cells]
+    cols = [c for _, c in cells]
+    return min(rows), min(cols), max(rows), max(cols)
+
+def light_cone(seed_window, max_steps, grid_size, wrap_around=False):
+    """
+    Returns a list of max_steps + 1 sets; entry t holds the cells that can be
+    alive at step t when only cells inside seed_window (top, left, bottom,
+    right, inclusive) are alive at step 0. Because dead[0] == 0, activity
+    spreads by at most one neighbor per step, so every other cell stays dead.
+    """
+    if seed_window is None:
+        cone = set()
+    else:
+        top, left, bottom, right = seed_window
+        cone = {(r, c) for r in range(top, bottom + 1) for c in range(left, right + 1)}
+    cones = [cone]
+    for _ in range(max_steps):
+        grown = set(cone)
+        for r, c in cone:
+            grown.update(neighbor_cells(r, c, grid_size, wrap_around))
+        cone = grown
+        cones.append(cone)
+    return cones
+
+def light_cone_grid_size(seed_size, max_steps):
+    """
+    The smallest grid that holds a seed_size x seed_size seed's whole light
+    cone over max_steps, so the grid edge can never influence the result.
+    """
+    return seed_size + 2 * max_steps
+
+class CAUnrolling:
+    """
+    The transition relation of a grid_size x grid_size CA unrolled over
+    max_steps, encoded once into a long-lived Solver. Each start/end query is
+    asked inside a push/pop scope, so the transition constraints are built a
+    single time and what the solver learns about them carries over from one
+    query to the next.
+
+    If seed_window (top, left, bottom, right, inclusive) is given, every start
+    configuration must keep its live cells inside it, and cells outside the
+    window's light cone are encoded as constant dead cells instead of
+    variables. The rulesets found are exactly those of the full encoding.
+
+    With the "bitvec" encoding each row of each step is one BitVec (bit c is
+    column c), neighbor counts come from bit-parallel adders over shifted
+    rows and the rule lookup is a bitwise multiplexer, so the whole grid
+    costs grid_size expressions per step instead of grid_size**2. Light-cone
+    pruning then works per row: rows the cone does not reach are constants.
+    grid_vars still holds one (one-bit) term per cell.
+
+    If telemetry (a telemetry.SolverTelemetry) is given, every solver check
+    goes through it: it is recorded, and its limits end a query with
+    SolverTimeout like the timeout arguments do. solver_config names the
+    portfolio.SOLVER_CONFIGS entry the solver is built with.
+    """
+
+    def __init__(self, grid_size, max_steps, wrap_around=False, encoding="bool",
+                 seed_window=None, telemetry=None, solver_config=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+        self.grid_size = grid_size
+        self.max_steps = 0
+        self.wrap_around = wrap_around
+        self.encoding = encoding
+        self.seed_window = seed_window
+        self.telemetry = telemetry
+        self.solver = make_solver(solver_config)
+        # Assumption literals of find_smallest_steps get unique names.
+        self._query_count = 0
+
+        if seed_window is None:
+            everywhere = {(r, c) for r in range(grid_size) for c in range(grid_size)}
+            self.cones = [everywhere]
+        else:
+            self.cones = light_cone(seed_window, 0, grid_size, wrap_around)
+        if encoding == "bitvec":
+            self.rows = [self._new_rows(0)]
+            self.grid_vars = [self._cells(self.rows[0])]
+            if seed_window is not None:
+                # The light cone prunes whole rows only; keep the start's
+                # live cells inside the window's columns too.
+                top, left, bottom, right = seed_window
+                outside = (1 << grid_size) - 1 - sum(1 << c for c in range(left, right + 1))
+                for r in range(top, bottom + 1):
+                    self.solver.add(self.rows[0][r] & outside == 0)
+            self.rule_dead_vars = [BitVec(f"Rule_Dead_{i}", 1) for i in range(9)]
+            self.rule_live_vars = [BitVec(f"Rule_Live_{i}", 1) for i in range(9)]
+            # The rule arrays spread across a row's lanes, built once.
+            self.dead_lanes = rule_lanes(self.rule_dead_vars, grid_size)
+            self.live_lanes = rule_lanes(self.rule_live_vars, grid_size)
+        else:
+            self.grid_vars = [self._new_layer(0)]
+            self.rule_dead_vars = [self._make(f"Rule_Dead_{i}") for i in range(9)]
+            self.rule_live_vars = [self._make(f"Rule_Live_{i}") for i in range(9)]
+            if encoding == "int":
+                for var in self.rule_dead_vars + self.rule_live_vars:
+                    self.solver.add(Or(var == 0, var == 1))
+        # When a cell is dead, having 0 neighbors should not revive it.
+        self.solver.add(self._is_value(self.rule_dead_vars[0], 0))
+        self.extend(max_steps)
+
+    def extend(self, max_steps):
+        """
+        Unrolls further, one transition layer at a time, until the unrolling
+        covers max_steps steps. Constraints already in the solver (and what it
+        has learned from them) are kept.
+        """
+        while self.max_steps < max_steps:
+            t = self.max_steps
+            if self.seed_window is None:
+                self.cones.append(self.cones[0])
+            else:
+                self.cones = light_cone(self.seed_window, t + 1, self.grid_size,
+                                        self.wrap_around)
+            if self.encoding == "bitvec":
+                self._add_step_bitvec(t)
+            else:
+                self._add_step(t)
+            self.max_steps = t + 1
+
+    def _make(self, name):
+        return Bool(name) if self.encoding == "bool" else Int(name)
+
+    def _new_layer(self, t):
+        dead_cell = BoolVal(False) if self.encoding == "bool" else IntVal(0)
+        layer = [[self._make(f"Grid_{t}_{r}_{c}") if (r, c) in self.cones[t] else dead_cell
+                  for c in range(self.grid_size)] for r in range(self.grid_size)]
+        if self.encoding == "int":
+            for r, c in sorted(self.cones[t]):
+                self.solver.add(Or(layer[r][c] == 0, layer[r][c] == 1))
+        return layer
+
+    def _add_step(self, t):
+        self.grid_vars.append(self._new_layer(t + 1))
+        neighbors_of = neighbor_table(self.grid_size, self.wrap_around)
+        cone = self.cones[t]
+        # Cells outside the next cone have no live neighbors and stay dead.
+        # Each cell's count is decoded once and read by both rule arrays.
+        for r, c in sorted(self.cones[t + 1]):
+            neighbors = [self.grid_vars[t][rr][cc] for rr, cc in neighbors_of[r][c]
+                         if (rr, cc) in cone]
+            current_cell = self.grid_vars[t][r][c]
+            if self.encoding == "bool":
+                exactly = one_hot_count(neighbors)
+                expected_next = If(current_cell,
+                                   select_rule_one_hot(exactly, self.rule_live_vars),
+                                   select_rule_one_hot(exactly, self.rule_dead_vars))
+            else:
+                indicators = count_indicators(Sum(neighbors) if neighbors else IntVal(0))
+                expected_next = If(current_cell == 0,
+                                   select_rule_indicators(indicators, self.rule_dead_vars),
+                                   select_rule_indicators(indicators, self.rule_live_vars))
+            self.solver.add(self.grid_vars[t + 1][r][c] == expected_next)
+
+    def _new_rows(self, t):
+        # One BitVec per row, or the constant 0 for rows the cone misses.
+        grid_size = self.grid_size
+        return [BitVec(f"Row_{t}_{r}", grid_size)
+                if any((r, c) in self.cones[t] for c in range(grid_size))
+                else BitVecVal(0, grid_size)
+                for r in range(grid_size)]
+
+    def _cells(self, rows):
+        return [[Extract(c, c, row) for c in range(self.grid_size)] for row in rows]
+
+    def _add_step_bitvec(self, t):
+        self.rows.append(self._new_rows(t + 1))
+        self.grid_vars.append(self._cells(self.rows[t + 1]))
+        for r in range(self.grid_size):
+            # Rows outside the next cone have no live neighbors and stay dead.
+            if is_bv_value(self.rows[t + 1][r]):
+                continue
+            counts = bitvec_count(neighbor_rows(self.rows[t], r, self.wrap_around))
+            current = self.rows[t][r]
+            expected_next = ((current & select_rule_lanes(counts, self.live_lanes)) |
+                             (~current & select_rule_lanes(counts, self.dead_lanes)))
+            self.solver.add(self.rows[t + 1][r] == expected_next)
+
+    def _is_value(self, var, value):
+        if self.encoding == "bool":
+            return var if value else Not(var)
+        return var == value
+
+    def _rule_value(self, model, var):
+        value = model.evaluate(var, model_completion=True)
+        if self.encoding == "bool":
+            return 1 if is_true(value) else 0
+        return value.as_long()
+
+    def _trajectory(self, model, last_step=None):
+        return [[[self._rule_value(model, var) for var in row] for row in layer]
+                for layer in self.grid_vars[:None if last_step is None else last_step + 1]]
+
+    def _check_start(self, start_config):
+        if self.seed_window is not None:
+            window = live_window(start_config)
+            top, left, bottom, right = self.seed_window
+            if window is not None and not (top <= window[0] and left <= window[1] and
+                                           window[2] <= bottom and window[3] <= right):
+                raise ValueError("start_config has live cells outside seed_window")
+
+    def _state_is(self, t, config):
+        # Constraints fixing the grid at step t to config.
+        if self.encoding == "bitvec":
+            return [self.rows[t][r] == row_value(config[r]) for r in range(self.grid_size)]
+        return [self._is_value(self.grid_vars[t][r][c], config[r][c])
+                for r in range(self.grid_size) for c in range(self.grid_size)]
+
+    def _check(self, deadline, solutions, *assumptions):
+        # solver.check within the remaining time budget (and the telemetry's
+        # limits); SolverTimeout (with the solutions found so far) once it
+        # runs out.
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SolverTimeout(solutions)
+        if self.telemetry is not None:
+            result = self.telemetry.check(self.solver, *assumptions, timeout=remaining)
+        else:
+            if remaining is not None:
+                self.solver.set("timeout", max(1, int(remaining * 1000)))
+            result = self.solver.check(*assumptions)
+        if result == unknown:
+            raise SolverTimeout(solutions)
+        return result
+
+    def _solution(self, model, families, last_step):
+        rule_vars = self.rule_dead_vars + self.rule_live_vars
+        bits = [self._rule_value(model, var) for var in rule_vars]
+        if families:
+            # Entries the trajectory never consults are free: every
+            # completion yields the same trajectory, so the whole
+            # family is one solution cube.
+            used = used_rule_entries(self._trajectory(model, last_step), self.wrap_around)
+            entries = [('dead', i) for i in range(9)] + [('live', i) for i in range(9)]
+            bits = [bit if entry in used or entry == ('dead', 0) else None
+                    for entry, bit in zip(entries, bits)]
+        return {'dead': bits[:9], 'live': bits[9:]}
+
+    def _blocking_clause(self, solution):
+        rule_vars = self.rule_dead_vars + self.rule_live_vars
+        bits = solution['dead'] + solution['live']
+        return Or([Not(self._is_value(var, bit))
+                   for var, bit in zip(rule_vars, bits) if bit is not None])
+
+    def find_all_solutions(self, start_config, end_config, timeout=None, families=False):
+        """
+        Same contract as find_all_z3_solutions_neighbor_count for this
+        unrolling's grid size, step count and wrap_around setting. If timeout
+        (seconds, for the whole enumeration) runs out, SolverTimeout is
+        raised carrying the rulesets found so far.
+        """
+        self._check_start(start_config)
+        solver = self.solver
+        deadline = None if timeout is None else time.monotonic() + timeout
+        solver.push()
+        try:
+            solver.add(self._state_is(0, start_config))
+            solver.add(self._state_is(self.max_steps, end_config))
+            solutions = []
+            while self._check(deadline, solutions) == sat:
+                solution = self._solution(solver.model(), families, self.max_steps)
+                solutions.append(solution)
+                # The blocking clause lives in this scope and is popped with it.
+                solver.add(self._blocking_clause(solution))
+            return solutions
+        finally:
+            solver.pop()
+            if deadline is not None:
+                # Z3's default, i.e. no timeout.
+                solver.set("timeout", 4294967295)
+
+    def find_smallest_steps(self, start_config, end_config, max_steps, min_steps=1, timeout=None,
+                            families=False):
+        """
+        Incremental bounded model checking over the step count: tries
+        min_steps, min_steps + 1, ... up to max_steps, extending the
+        unrolling by one layer whenever a longer horizon is needed, and stops
+        at the first step count for which some ruleset takes start_config to
+        end_config. Each horizon's goal is checked under its own assumption
+        literal, so everything the solver learned at shorter horizons carries
+        over and the unrolling can be reused by later queries.
+
+        Returns (steps, rulesets): the smallest working step count and all
+        rulesets for it (as find_all_solutions would return them), or
+        (None, []) if no step count up to max_steps works. Raises
+        SolverTimeout if timeout (seconds, whole query) runs out.
+        """
+        self._check_start(start_config)
+        solver = self.solver
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._query_count += 1
+        query = Bool(f"Query_{self._query_count}")
+        solver.add(Implies(query, And(self._state_is(0, start_config))))
+        try:
+            for steps in range(min_steps, max_steps + 1):
+                self.extend(steps)
+                goal = Bool(f"Query_{self._query_count}_Goal_{steps}")
+                solver.add(Implies(goal, And(self._state_is(steps, end_config))))
+                solutions = []
+                while self._check(deadline, solutions, query, goal) == sat:
+                    solution = self._solution(solver.model(), families, steps)
+                    solutions.append(solution)
+                    solver.add(Implies(goal, self._blocking_clause(solution)))
+                if solutions:
+                    return steps, solutions
+            return None, []
+        finally:
+            # Retire the query's literals for good.
+            solver.add(Not(query))
+            if deadline is not None:
+                solver.set("timeout", 4294967295)
+
+    def _seed_cells(self):
+        top, left, bottom, right = self.seed_window
+        return [(r, c) for r in range(top, bottom + 1) for c in range(left, right + 1)]
+
+    def _shifted(self, t, shift_x, shift_y):
+        # Constraints making step t equal to shift_grid(step 0, shift_x, shift_y).
+        n = self.grid_size
+        if self.encoding == "bitvec":
+            return [self.rows[t][r] == (shift_row(self.rows[0][r - shift_y], shift_x)
+                                        if 0 <= r - shift_y < n else 0)
+                    for r in range(n)]
+        constraints = []
+        for r in range(n):
+            for c in range(n):
+                cell = self.grid_vars[t][r][c]
+                if 0 <= r - shift_y < n and 0 <= c - shift_x < n:
+                    constraints.append(cell == self.grid_vars[0][r - shift_y][c - shift_x])
+                else:
+                    constraints.append(self._is_value(cell, 0))
+        return constraints
+
+    def find_spaceships(self, shifts, steps=None, min_population=1, max_population=None,
+                        anchor_seed=False, timeout=None, families=False, limit=None):
+        """
+        One symbolic query for spaceships: the start configuration inside
+        seed_window, its population and the shift are left free and found by
+        the solver together with the ruleset, instead of being enumerated in
+        Python one solver call at a time.
+
+        Parameters:
+          shifts          - (shift_x, shift_y) pairs the start configuration
+                            may reappear at, as in shift_grid
+          steps           - step counts to accept (default: this unrolling's
+                            max_steps); the unrolling is extended as needed
+          min_population,
+          max_population  - bounds on the number of live seed cells
+          anchor_seed     - if True, the seed must have a live cell in the
+                            window's top row and in its left column, which
+                            keeps one seed per translation inside the window.
+                            Exact when the grid holds the window's light cone
+                            (see light_cone_grid_size) and wrap_around is off.
+          timeout         - seconds for the whole enumeration; SolverTimeout
+                            carries the spaceships found so far
+          families        - as for find_all_solutions
+          limit           - stop after this many spaceships
+
+        Returns:
+          A list of spaceships, one per distinct (seed, ruleset), each a dict
+          with keys 'seed' (the seed window's cells), 'steps' and 'shift' (the
+          first accepted step count and shift it reappears at) and 'ruleset'.
+        """
+        if self.seed_window is None:
+            raise ValueError("find_spaceships needs an unrolling with a seed_window")
+        steps = sorted([self.max_steps] if steps is None else steps)
+        self.extend(steps[-1])
+        solver = self.solver
+        deadline = None if timeout is None else time.monotonic() + timeout
+        top, left, bottom, right = self.seed_window
+        seed_cells = self._seed_cells()
+        alive = [self._is_value(self.grid_vars[0][r][c], 1) for r, c in seed_cells]
+        solver.push()
+        try:
+            solver.add(AtLeast(*alive, min_population))
+            if max_population is not None:
+                solver.add(AtMost(*alive, max_population))
+            if anchor_seed:
+                solver.add(Or([self._is_value(self.grid_vars[0][top][c], 1)
+                               for c in range(left, right + 1)]))
+                solver.add(Or([self._is_value(self.grid_vars[0][r][left], 1)
+                               for r in range(top, bottom + 1)]))
+            solver.add(Or([And(self._shifted(t, shift_x, shift_y))
+                           for t in steps for shift_x, shift_y in shifts]))
+            spaceships = []
+            while ((limit is None or len(spaceships) < limit) and
+                   self._check(deadline, spaceships) == sat):
+                model = solver.model()
+                trajectory = self._trajectory(model, steps[-1])
+                t, shift = next((t, [shift_x, shift_y]) for t in steps for shift_x, shift_y in shifts
+                                if trajectory[t] == shift_grid(trajectory[0], shift_x, shift_y))
+                seed = [row[left:right + 1] for row in trajectory[0][top:bottom + 1]]
+                spaceship = {'seed': seed, 'steps': t, 'shift': shift,
+                             'ruleset': self._solution(model, families, t)}
+                spaceships.append(spaceship)
+                # Block this seed with this ruleset (or ruleset family).
+                solver.add(Or([Not(self._is_value(self.grid_vars[0][r][c], seed[r - top][c - left]))
+                               for r, c in seed_cells] +
+                              [self._blocking_clause(spaceship['ruleset'])]))
+            return spaceships
+        finally:
+            solver.pop()
+            if deadline is not None:
+                solver.set("timeout", 4294967295)
+
+def find_all_z3_spaceships(seed_size, grid_size, steps, shifts, wrap_around=False,
+                           encoding="bitvec", min_population=1, max_population=None,
+                           anchor_seed=False, families=False, timeout=None, telemetry=None):
+    """
+    Finds every seed_size x seed_size seed (centred in a grid_size x
+    grid_size grid, as pad_grid places it) and ruleset such that the seed
+    reappears shifted by one of shifts after one of steps, in a single
+    symbolic query. See CAUnrolling.find_spaceships for the parameters and
+    the result, and CAUnrolling for telemetry.
+    """
+    offset = (grid_size - seed_size) // 2
+    seed_window = (offset, offset, offset + seed_size - 1, offset + seed_size - 1)
+    unrolling = CAUnrolling(grid_size, min(steps), wrap_around, encoding, seed_window, telemetry)
+    return unrolling.find_spaceships(shifts, steps, min_population, max_population, anchor_seed,
+                                     timeout, families)
+
 def parse_grid(grid_str):
     """
     Parses a multi-line string of 1s and 0s into a 2D list (grid) of integers.
@@ -188,26 +685,20 @@ def shift_grid(grid, shift_x, shift_y):
     return new_grid
 
 if __name__ == "__main__":
-    # We generate all 3x3 candidate grids (with exactly 3 ones) and then pad
-    # them to a 9x9 start configuration. The end configuration is computed by
-    # shifting the padded grid by shift_x and shift_y.
-    
-    def generate_3x3_grids_with_n_ones(ones_count):
-        """
-        Generates all possible 3x3 grids (as a list of lists) which contain exactly 3 ones.
-        There are C(9, 3) = 84 candidates.
-        """
-        assert ones_count in [0,1,2,3,4,5,6,7,8,9]
-        candidates = []
-        # There are 9 cells (flattened), choose 3 of them to be 1.
-        for ones_indices in itertools.combinations(range(9), ones_count):
-            grid_flat = [0] * 9
-            for idx in ones_indices:
-                grid_flat[idx] = 1
-            # Reshape the flat list into a 3x3 grid.
-            grid_candidate = [grid_flat[i*3:(i+1)*3] for i in range(3)]
-            candidates.append(grid_candidate)
-        return candidates
+    from ca_symmetry import generate_grids_with_n_ones, group_equivalent_jobs
+
+    # We generate all seed_size x seed_size candidate grids (with exactly
+    # n_ones ones) and then pad them to a target_size x target_size start
+    # configuration. The end configuration is computed by shifting the padded
+    # grid by shift_x and shift_y. Jobs that are rotations, reflections or
+    # translated copies of each other are solved once (see ca_symmetry.py).
+    seed_size = 3
+    target_size = 9
+    # With use_light_cone, only cells the seed window can reach are encoded.
+    # Setting auto_size as well picks, per step count, the smallest grid that
+    # holds the whole light cone instead of target_size.
+    use_light_cone = True
+    auto_size = False
     
     def print_grid(grid):
         """
@@ -216,58 +707,280 @@ if __name__ == "__main__":
         for row in grid:
             print("".join(str(cell) for cell in row))
     
+    # Search engine: "z3" builds a solver per candidate, "numpy" simulates
+    # the candidate under all 2**17 rulesets at once (see ca_numpy.py).
+    engine = "z3"
+    if engine == "numpy":
+        from ca_numpy import find_all_numpy_solutions_neighbor_count
+
+    # Encoding used by the z3 engine ("int", "bool" or "bitvec"). When
+    # cross_check is set, every candidate is also solved with another
+    # encoding and the two sets of rulesets are compared.
+    encoding = "bool"
+    cross_check = False
+
+    # With reuse_solver, the z3 engine keeps one CAUnrolling per
+    # (grid size, steps, wrap_around) and asks every candidate against it.
+    reuse_solver = True
+    unrollings = {}
+
+    # With incremental, each symmetry class is asked once for the smallest
+    # step count in steps_range that reaches its end grid (see
+    # CAUnrolling.find_smallest_steps) instead of once per step count; a
+    # single unrolling per grid size grows as longer horizons are needed.
+    # Implies the z3 engine and reuse_solver.
+    incremental = False
+    steps_range = range(2, 5)
+
+    # With symbolic, the whole nested loop below becomes one query
+    # (find_all_z3_spaceships): the seed, its population and the shift are
+    # left to the solver, which finds them together with the ruleset.
+    # Implies the z3 engine.
+    symbolic = False
+
+    # With use_telemetry, every check of the z3 engine is recorded in
+    # z3_ca_events.jsonl (see telemetry.py) and a progress line is printed
+    # every progress_interval seconds. A check that exceeds query_timeout
+    # ends its query with the rulesets found so far; total_timeout or
+    # max_memory_mb end the whole search.
+    use_telemetry = False
+    progress_interval = 60
+    query_timeout = None
+    total_timeout = None
+    max_memory_mb = None
+    search_telemetry = None
+    if use_telemetry:
+        from telemetry import SolverTelemetry
+        search_telemetry = SolverTelemetry("z3_ca_events.jsonl", progress_interval=progress_interval,
+                                           progress_stream=sys.stderr, query_timeout=query_timeout,
+                                           total_timeout=total_timeout,
+                                           max_memory_mb=max_memory_mb)
+
+    def seed_window_for(grid_size):
+        if not use_light_cone:
+            return None
+        # pad_grid centres the seed window.
+        offset = (grid_size - seed_size) // 2
+        return (offset, offset, offset + seed_size - 1, offset + seed_size - 1)
+
+    # With use_portfolio, every job of the z3 engine is raced under several
+    # Z3 configurations in parallel processes (see portfolio.py) instead of
+    # being asked of a reused unrolling; the winners are recorded in
+    # portfolio_wins.db. Not combined with use_telemetry.
+    use_portfolio = False
+    job_portfolio = None
+    if use_portfolio:
+        from portfolio import Portfolio
+        job_portfolio = Portfolio(wins_path="portfolio_wins.db")
+
+    # With store_path, every solved job (each orientation in its class, with
+    # each of its rulesets) is packed into a result store (see
+    # result_store.py) instead of being shown one ruleset at a time; export
+    # it to viewer configs and share links with result_store.py export.
+    store_path = None
+    result_store = None
+    if store_path:
+        from result_store import ResultStore
+        store_size = light_cone_grid_size(seed_size, max(steps_range)) if auto_size else target_size
+        result_store = ResultStore(store_path, "spaceship", store_size)
+
+    def cut_short(e):
+        """
+        Reports a query that a telemetry limit ended early and returns the
+        rulesets it found; ends the search once a total limit is reached.
+        """
+        print(f" -> stopped early ({search_telemetry.last_reason}) after "
+              f"{len(e.solutions)} solution(s)")
+        if search_telemetry.stopped:
+            print(f"Search stopped ({search_telemetry.stopped}). "
+                  f"Total candidates with solutions: {found_count}")
+            search_telemetry.close()
+            sys.exit(1)
+        return e.solutions
+
+    def solve(start_config, end_config, max_steps):
+        """
+        Finds all rulesets for one job with the configured engine.
+        """
+        if engine == "numpy":
+            return find_all_numpy_solutions_neighbor_count(
+                start_config, end_config, max_steps, wrap_around=False
+            )
+        if job_portfolio is not None:
+            solutions = find_all_z3_solutions_neighbor_count(
+                start_config, end_config, max_steps, wrap_around=False, encoding=encoding,
+                light_cone=use_light_cone, portfolio=job_portfolio
+            )
+        elif reuse_solver:
+            seed_window = seed_window_for(len(start_config))
+            unrolling_key = (len(start_config), max_steps, False, encoding, seed_window)
+            if unrolling_key not in unrollings:
+                unrollings[unrolling_key] = CAUnrolling(*unrolling_key,
+                                                        telemetry=search_telemetry)
+            try:
+                solutions = unrollings[unrolling_key].find_all_solutions(start_config,
+                                                                         end_config)
+            except SolverTimeout as e:
+                solutions = cut_short(e)
+        else:
+            try:
+                solutions = find_all_z3_solutions_neighbor_count(
+                    start_config, end_config, max_steps, wrap_around=False, encoding=encoding,
+                    light_cone=use_light_cone, telemetry=search_telemetry
+                )
+            except SolverTimeout as e:
+                solutions = cut_short(e)
+        if cross_check:
+            other = "int" if encoding == "bool" else "bool"
+            other_solutions = find_all_z3_solutions_neighbor_count(
+                start_config, end_config, max_steps, wrap_around=False, encoding=other
+            )
+            key = lambda sol: (tuple(sol['dead']), tuple(sol['live']))
+            if set(map(key, solutions)) != set(map(key, other_solutions)):
+                raise AssertionError(f"{encoding} and {other} encodings disagree")
+        return solutions
+
+    def report(i, job_class, solutions, steps):
+        """
+        Prints one solved class and waits for the user, or packs it into
+        result_store; returns the number of jobs it covers.
+        """
+        print(f" -> Class {i} has {len(solutions)} solution(s)!")
+        # Every orientation in the class has exactly these rulesets.
+        for padded_grid, job_shift_x, job_shift_y in job_class:
+            print(f"Starting grid (shift_x: {job_shift_x}, shift_y: {job_shift_y}):")
+            print_grid(padded_grid)
+            if result_store is not None:
+                result_store.add({'start': padded_grid, 'steps': steps,
+                                  'shift': [job_shift_x, job_shift_y], 'rulesets': solutions})
+        if result_store is not None:
+            print(f"{len(job_class) * len(solutions)} record(s) stored in {store_path}")
+            return len(job_class)
+        print("First solution (ruleset):")
+        share_ruleset(solutions[0])
+        return len(job_class)
+
+    def share_ruleset(ruleset):
+        """
+        Prints a ruleset as JSON, copies it to the clipboard and waits for
+        the user.
+        """
+        ruleset_json = json.dumps(ruleset, indent=2)
+        print(ruleset_json)
+
+        # Copy the ruleset to the clipboard for use in ca.html's load rulesets box.
+        if clipboard_available:
+            pyperclip.copy(ruleset_json)
+            print("Ruleset copied to clipboard.")
+        else:
+            print("pyperclip is not installed; ruleset not copied.")
+
+        # Pause execution until the user indicates it should continue.
+        input("Solution found. Press Enter to continue searching...")
+
     found_count = 0
-    
-    # Parameterized values for shifting the grid.
-    # iterate through all possible shifts where shift_x and shift_y are between -3 and 3
-    for n_ones in range(1, 10):
-        for shift_x in range(0, 3):
-            for shift_y in range(1, 3):
-                # Simulation steps allowed.
-                for max_steps in range(2, 5):
-                    print(f"shift_x: {shift_x}, shift_y: {shift_y}, steps: {max_steps}")
-        
-                    candidate_grids = generate_3x3_grids_with_n_ones(n_ones)
-                    print("Searching for candidate starting grids (3x3 with exactly 3 ones) with solutions...\n")
-                    
-                    # Iterate over each candidate grid.
-                    for i, candidate in enumerate(candidate_grids, start=1):
-                        # Pad the candidate grid (3x3) to a 9x9 grid.
-                        padded_candidate = pad_grid(candidate, target_size=9)
-                        # Compute the end configuration by shifting the padded grid.
-                        end_config = shift_grid(padded_candidate, shift_x, shift_y)
-                        print(f"Candidate {i} (shift_x: {shift_x}, shift_y: {shift_y}, steps: {max_steps}):")
-                        print("Start grid (padded to 9x9):")
-                        print_grid(padded_candidate)
-                        
-                        # Try to find valid rulesets that transform the start grid to the end grid.
-                        solutions = find_all_z3_solutions_neighbor_count(
-                            padded_candidate, end_config, max_steps, wrap_around=False
-                        )
-                        if solutions:
-                            print(f" -> Candidate {i} has {len(solutions)} solution(s)!")
-                            # Print the starting grid (again) to make sure it's clearly visible.
-                            print("Starting grid:")
-                            print_grid(padded_candidate)
-                            
-                            # Format the first solution as JSON.
-                            ruleset_json = json.dumps(solutions[0], indent=2)
-                            print("First solution (ruleset):")
-                            print(ruleset_json)
-                            
-                            # Copy the ruleset to the clipboard for use in ca.html's load rulesets box.
-                            if clipboard_available:
-                                pyperclip.copy(ruleset_json)
-                                print("Ruleset copied to clipboard.")
-                            else:
-                                print("pyperclip is not installed; ruleset not copied.")
-                            
-                            # Pause execution until the user indicates it should continue.
-                            input("Solution found. Press Enter to continue searching...")
-                            found_count += 1
-                        else:
-                            print(f" -> Candidate {i} has no solution.")
-                        print("-" * 40)
+
+    if symbolic:
+        last_steps = max(steps_range)
+        grid_size = light_cone_grid_size(seed_size, last_steps) if auto_size else target_size
+        shifts = [(shift_x, shift_y) for shift_x in range(0, 3) for shift_y in range(1, 3)]
+        print(f"One symbolic query over all {seed_size}x{seed_size} seeds, steps "
+              f"{min(steps_range)}..{last_steps} and shifts {shifts}...\n")
+        # Translated seeds are only interchangeable when the grid holds the
+        # whole light cone; otherwise every placement is reported.
+        try:
+            spaceships = find_all_z3_spaceships(seed_size, grid_size, steps_range, shifts,
+                                                encoding=encoding, anchor_seed=auto_size,
+                                                telemetry=search_telemetry)
+        except SolverTimeout as e:
+            spaceships = cut_short(e)
+        for i, spaceship in enumerate(spaceships, start=1):
+            shift_x, shift_y = spaceship['shift']
+            print(f"Spaceship {i} (shift_x: {shift_x}, shift_y: {shift_y}, "
+                  f"steps: {spaceship['steps']}):")
+            print_grid(pad_grid(spaceship['seed'], target_size=grid_size))
+            if result_store is not None:
+                result_store.add(spaceship)
+            else:
+                print("Ruleset:")
+                share_ruleset(spaceship['ruleset'])
+            print("-" * 40)
+        found_count = len(spaceships)
+
+    # The symbolic query covers every population at once.
+    populations = [] if symbolic else range(1, seed_size * seed_size + 1)
+    for n_ones in populations:
+        candidate_grids = generate_grids_with_n_ones(n_ones, seed_size)
+        if incremental:
+            last_steps = max(steps_range)
+            grid_size = light_cone_grid_size(seed_size, last_steps) if auto_size else target_size
+            jobs = [(pad_grid(candidate, target_size=grid_size), shift_x, shift_y)
+                    for shift_x in range(0, 3) for shift_y in range(1, 3)
+                    for candidate in candidate_grids]
+            # Classes that are equivalent at the longest horizon are
+            # equivalent at every shorter one.
+            job_classes = group_equivalent_jobs(jobs, last_steps)
+            unrolling_key = (grid_size, min(steps_range), False, encoding,
+                             seed_window_for(grid_size))
+            if unrolling_key not in unrollings:
+                unrollings[unrolling_key] = CAUnrolling(*unrolling_key,
+                                                        telemetry=search_telemetry)
+            print(f"n_ones: {n_ones}, steps {min(steps_range)}..{last_steps}: "
+                  f"{len(jobs)} jobs in {len(job_classes)} symmetry classes\n")
+            for i, job_class in enumerate(job_classes, start=1):
+                padded_candidate, shift_x, shift_y = job_class[0]
+                end_config = shift_grid(padded_candidate, shift_x, shift_y)
+                print(f"Class {i} (shift_x: {shift_x}, shift_y: {shift_y}, "
+                      f"{len(job_class)} equivalent job(s)):")
+                print_grid(padded_candidate)
+                try:
+                    steps, solutions = unrollings[unrolling_key].find_smallest_steps(
+                        padded_candidate, end_config, last_steps, min_steps=min(steps_range))
+                except SolverTimeout as e:
+                    # A cut-short query reports no step count.
+                    cut_short(e)
+                    steps, solutions = None, []
+                if solutions:
+                    print(f" -> smallest step count: {steps}")
+                    found_count += report(i, job_class, solutions, steps)
+                else:
+                    print(f" -> Class {i} has no solution up to {last_steps} steps.")
+                print("-" * 40)
+            continue
+
+        # Simulation steps allowed.
+        for max_steps in steps_range:
+            grid_size = light_cone_grid_size(seed_size, max_steps) if auto_size else target_size
+            # Parameterized values for shifting the grid.
+            jobs = []
+            for shift_x in range(0, 3):
+                for shift_y in range(1, 3):
+                    for candidate in candidate_grids:
+                        jobs.append((pad_grid(candidate, target_size=grid_size),
+                                     shift_x, shift_y))
+            job_classes = group_equivalent_jobs(jobs, max_steps)
+            print(f"n_ones: {n_ones}, steps: {max_steps}: "
+                  f"{len(jobs)} jobs in {len(job_classes)} symmetry classes")
+            print(f"Searching for candidate starting grids ({seed_size}x{seed_size} "
+                  f"with exactly {n_ones} ones) with solutions...\n")
+
+            for i, job_class in enumerate(job_classes, start=1):
+                padded_candidate, shift_x, shift_y = job_class[0]
+                # Compute the end configuration by shifting the padded grid.
+                end_config = shift_grid(padded_candidate, shift_x, shift_y)
+                print(f"Class {i} (shift_x: {shift_x}, shift_y: {shift_y}, steps: {max_steps}, "
+                      f"{len(job_class)} equivalent job(s)):")
+                print(f"Start grid (padded to {grid_size}x{grid_size}):")
+                print_grid(padded_candidate)
+
+                # Try to find valid rulesets that transform the start grid to the end grid.
+                solutions = solve(padded_candidate, end_config, max_steps)
+                if solutions:
+                    found_count += report(i, job_class, solutions, max_steps)
+                else:
+                    print(f" -> Class {i} has no solution.")
+                print("-" * 40)
                 
+    if search_telemetry is not None:
+        search_telemetry.close()
     print(f"Total candidates with solutions: {found_count}")
-    
\ No newline at end of file
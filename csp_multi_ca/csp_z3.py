@@ -1,216 +1,1037 @@
+"""
+Searches for two-layer (blue/orange) walkers: a seed and four rule arrays such
+that the seed reappears, isolated, at a neighboring offset after some period.
+
+Use WalkerSearch for a single query, find_walkers to run a search (optionally
+split into one independent subproblem per period and offset, solved by a
+process pool), or the command line:
+
+    python csp_z3.py --grid-size 9 --periods 1:7 --seed-start 4 --split --workers 8
+"""
 from z3 import *
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
 
-# ------------------------
-# PARAMETERS
-# ------------------------
-grid_size = 9      # simulation grid is 7 x 7
-steps = 8          # time steps 0 .. 7; we require replication by some t in {1,...,7}
-seed_start = 4     # the free 3x3 seed is placed in rows/cols 2,3,4
-seed_end = seed_start + 3  # exclusive
+# The shared helpers live next to the single-layer search.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "CSP_Cellular_Automata"))
+from ca_encoding import (bitvec_count, count_indicators, neighbor_rows, neighbor_table,
+                         rule_lanes, select_rule_indicators, select_rule_lanes, shift_row)
+from ca_symmetry import DIHEDRAL_TRANSFORMS
+from portfolio import SOLVER_CONFIGS, Portfolio, make_solver
+from result_cache import ResultCache, cache_key
+from result_store import ResultStore
+from telemetry import SolverTelemetry
+from z3_ca import light_cone, light_cone_grid_size
 
-# ------------------------
-# SET UP SOLVER
-# ------------------------
-s = Solver()
+# The eight neighboring offsets. As everywhere in this file, dx shifts rows and
+# dy shifts columns.
+ALL_OFFSETS = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)]
+OFFSET_SETS = {
+    'all': ALL_OFFSETS,
+    'orthogonal': [(dx, dy) for dx, dy in ALL_OFFSETS if dx == 0 or dy == 0],
+    'diagonal': [(dx, dy) for dx, dy in ALL_OFFSETS if dx != 0 and dy != 0],
+}
 
-# ------------------------
-# RULESET VARIABLES
-# ------------------------
-# Each ruleset (for blue and for orange) is represented by two arrays:
-# one for a dead cell outcome [index = neighbor count] and one for a live cell.
-# They are Int variables constrained to be either 0 or 1.
-def create_ruleset(prefix):
-    dead = [Int(f"{prefix}_dead_{i}") for i in range(9)]
-    live = [Int(f"{prefix}_live_{i}") for i in range(9)]
-    for i in range(9):
-        s.add(Or(dead[i] == 0, dead[i] == 1))
-        s.add(Or(live[i] == 0, live[i] == 1))
-    # Prevent spontaneous birth in a dead cell with 0 neighbors.
-    s.add(dead[0] == 0)
-    return dead, live
-
-blue_dead, blue_live = create_ruleset("blue")
-orange_dead, orange_live = create_ruleset("orange")
-s.add(orange_dead[0] == 0)  # also add for orange
+# "int" gives every cell a 0/1 Int; "bitvec" packs each row of each layer
+# into a BitVec and updates all cells of a row with bitwise operations.
+ENCODINGS = ("int", "bitvec")
 
 # ------------------------
-# STATE VARIABLES
+# SYMMETRIES
 # ------------------------
-# For time t = 0,1,...,7, define the blue and orange layers over a grid_size x grid_size.
-state_blue = [[[Int(f"B_{t}_{r}_{c}") for c in range(grid_size)]
-               for r in range(grid_size)] for t in range(steps)]
-state_orange = [[[Int(f"O_{t}_{r}_{c}") for c in range(grid_size)]
-                 for r in range(grid_size)] for t in range(steps)]
-
-# Constrain all state variables to be 0 or 1.
-for t in range(steps):
-    for r in range(grid_size):
-        for c in range(grid_size):
-            s.add(Or(state_blue[t][r][c] == 0, state_blue[t][r][c] == 1))
-            s.add(Or(state_orange[t][r][c] == 0, state_orange[t][r][c] == 1))
-
-# Define the initial conditions.
-# The 3x3 seed (positions r,c in {2,3,4}) is free; everywhere else the grid is dead.
-for r in range(grid_size):
-    for c in range(grid_size):
-        if r >= seed_start and r < seed_end and c >= seed_start and c < seed_end:
-            # (r, c) is in the seed: no constraint so that all 4 states (dead, blue, orange, both) are allowed.
-            pass
+# Swapping the blue and orange layers together with their rulesets maps
+# walkers to walkers (the white-cell rule is symmetric in the two colours).
+# A rotation or reflection of the grid does too, provided it maps the seed
+# window, the set of accepted offsets and the excluded replications onto
+# themselves; on a bounded grid that needs the seed window to be centred.
+# A symmetry is a (transform, swap) pair, transform taken from
+# DIHEDRAL_TRANSFORMS and swap a bool.
+def _transform_offset(transform, dx, dy):
+    # The linear part of a grid transform applied to an offset.
+    r0, c0 = transform(0, 0, 1)
+    r1, c1 = transform(dx, dy, 1)
+    return (r1 - r0, c1 - c0)
+
+def spatial_symmetries(grid_size, seed_start, seed_size, allowed_offsets, exclude=()):
+    # The DIHEDRAL_TRANSFORMS that are exact symmetries of a search.
+    if 2 * seed_start + seed_size != grid_size:
+        return [DIHEDRAL_TRANSFORMS[0]]
+    offsets = {tuple(offset) for offset in allowed_offsets}
+    excluded = {tuple(triple) for triple in exclude}
+    found = []
+    for transform in DIHEDRAL_TRANSFORMS:
+        if {_transform_offset(transform, dx, dy) for dx, dy in offsets} != offsets:
+            continue
+        if {(t,) + _transform_offset(transform, dx, dy) for t, dx, dy in excluded} != excluded:
+            continue
+        found.append(transform)
+    return found
+
+def walker_symmetries(grid_size, seed_start, seed_size, allowed_offsets, exclude=()):
+    # All (transform, swap) symmetries of a search, identity first.
+    return [(transform, swap) for swap in [False, True]
+            for transform in spatial_symmetries(grid_size, seed_start, seed_size,
+                                                allowed_offsets, exclude)]
+
+def transform_walker(walker, transform, swap):
+    # Applies one symmetry to a structured walker.
+    layers = ['orange', 'blue'] if swap else ['blue', 'orange']
+    seeds = [walker['seed_' + layer] for layer in layers]
+    n = len(seeds[0])
+    new_seeds = [[[0] * n for _ in range(n)] for _ in seeds]
+    for k, seed in enumerate(seeds):
+        for r in range(n):
+            for c in range(n):
+                rr, cc = transform(r, c, n)
+                new_seeds[k][rr][cc] = seed[r][c]
+    result = dict(walker)
+    result['seed_blue'], result['seed_orange'] = new_seeds
+    result['blue'] = {kind: list(walker[layers[0]][kind]) for kind in ['dead', 'live']}
+    result['orange'] = {kind: list(walker[layers[1]][kind]) for kind in ['dead', 'live']}
+    result['offset'] = list(_transform_offset(transform, *walker['offset']))
+    return result
+
+def expand_walker_orbit(walker, symmetries):
+    # Every distinct walker that one of the symmetries maps walker to,
+    # walker itself first.
+    orbit = {}
+    for transform, swap in symmetries:
+        image = transform_walker(walker, transform, swap)
+        orbit.setdefault(json.dumps(image, sort_keys=True), image)
+    return list(orbit.values())
+
+def lex_leq(xs, ys):
+    # xs <= ys in lexicographic order, for equal-length lists of 0/1 terms.
+    expr = BoolVal(True)
+    for x, y in reversed(list(zip(xs, ys))):
+        if x.eq(y):
+            continue
+        less = ULT(x, y) if is_bv(x) else x < y
+        expr = Or(less, And(x == y, expr))
+    return expr
+
+class WalkerSearch:
+    """
+    One walker query in its own Solver.
+
+    Parameters:
+      grid_size        - simulation grid is grid_size x grid_size
+      periods          - replication times t to accept; time steps
+                         0 .. max(periods) are encoded
+      seed_start       - the free seed occupies rows/cols
+                         seed_start .. seed_start + seed_size - 1
+      seed_size        - side of the free seed window
+      allowed_offsets  - (dx, dy) offsets the seed may replicate at
+      use_light_cone   - if True, only cells the seed can reach by step t
+                         (one cell per step, as dead[0] == 0) get state
+                         variables; all other cells are the constant 0
+      exclude          - (t, dx, dy) replications that must NOT happen, with
+                         t < min(periods). find_walkers uses this to make the
+                         per-(period, offset) subproblems disjoint.
+      symmetry_breaking - if True, only the lexicographically smallest walker
+                         of each symmetry orbit (colour swap and, where exact,
+                         rotations/reflections) is searched for; see
+                         expand_walker_orbit to recover the rest
+      exclude_rulesets - (blue, orange) ruleset pairs the solver must not use,
+                         e.g. pairs whose seeds multi_numpy.screen_seeds has
+                         already tried exhaustively
+      encoding         - one of ENCODINGS. With "bitvec", the rows of both
+                         layers are BitVecs (bit c is column c), state_blue
+                         and state_orange hold one-bit Extracts of them, and
+                         the light cone prunes whole rows only.
+      incremental      - if True, only time step 0 is encoded up front and
+                         there is no replication constraint; use
+                         first_period_walkers, which adds one step at a time
+                         and asks for a replication at each period in turn.
+      telemetry        - a telemetry.SolverTelemetry that records every
+                         solver check; when one of its limits cuts a check
+                         short, the enumeration ends with the walkers found
+                         so far.
+      solver_config    - the portfolio.SOLVER_CONFIGS entry the solver is
+                         built with (default: the plain SMT core)
+    """
+
+    def __init__(self, grid_size=9, periods=range(1, 8), seed_start=4, seed_size=3,
+                 allowed_offsets=ALL_OFFSETS, use_light_cone=True, exclude=(),
+                 symmetry_breaking=False, exclude_rulesets=(), encoding="int",
+                 incremental=False, telemetry=None, solver_config=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+        self.grid_size = grid_size
+        self.periods = sorted(periods)
+        self.steps = max(self.periods) + 1
+        self.seed_start = seed_start
+        self.seed_end = seed_start + seed_size  # exclusive
+        self.seed_size = seed_size
+        self.allowed_offsets = [tuple(offset) for offset in allowed_offsets]
+        self.exclude = [tuple(triple) for triple in exclude]
+        self.symmetry_breaking = symmetry_breaking
+        self.exclude_rulesets = [list(pair) for pair in exclude_rulesets]
+        self.encoding = encoding
+        self.incremental = incremental
+        self.telemetry = telemetry
+        self.symmetries = walker_symmetries(grid_size, seed_start, seed_size,
+                                            self.allowed_offsets, self.exclude)
+        steps = self.steps
+        s = self.s = make_solver(solver_config)
+        if use_light_cone:
+            self.cones = light_cone((seed_start, seed_start, self.seed_end - 1, self.seed_end - 1),
+                                    steps - 1, grid_size)
+        else:
+            self.cones = [{(r, c) for r in range(grid_size) for c in range(grid_size)}] * steps
+        if encoding == "bitvec":
+            self._build_bitvec()
         else:
-            s.add(state_blue[0][r][c] == 0)
-            s.add(state_orange[0][r][c] == 0)
+            self._build_int()
+        if not incremental:
+            self.extend(steps - 1)
 
-# ------------------------
-# ADDITIONAL CONSTRAINT
-# ------------------------
-# The starting seed must have at least one blue cell and at least one orange cell.
-seed_blue_nonzero = []
-seed_orange_nonzero = []
-for r in range(seed_start, seed_end):
-    for c in range(seed_start, seed_end):
-        seed_blue_nonzero.append(state_blue[0][r][c] == 1)
-        seed_orange_nonzero.append(state_orange[0][r][c] == 1)
-s.add(Or(seed_blue_nonzero))
-s.add(Or(seed_orange_nonzero))
+        # ------------------------
+        # REPLICATION CONSTRAINT WITH ISOLATION
+        # ------------------------
+        # We require that there exists some time t in periods and an offset (dx, dy)
+        # (from allowed_offsets) such that:
+        # 1. The seed at time 0 is exactly replicated (for both blue and orange) at the region
+        #    shifted by (dx, dy) at time t.
+        # 2. *All* cells in the grid outside this replicated region are dead.
+        # In incremental mode, first_period_walkers adds this one period at a time.
+        if not incremental:
+            s.add(Or([self._replications(t) for t in self.periods]))
 
-# ------------------------
-# NEIGHBOR COUNT
-# ------------------------
-# Since the grid is finite, out-of-bound neighbors count as dead (i.e. 0).
-def neighbor_count(state, t, r, c):
-    neighbors = []
-    for dr in [-1, 0, 1]:
-        for dc in [-1, 0, 1]:
-            if dr == 0 and dc == 0:
-                continue
-            nr = r + dr
-            nc = c + dc
-            if 0 <= nr < grid_size and 0 <= nc < grid_size:
-                neighbors.append(state[t][nr][nc])
+        for blue, orange in self.exclude_rulesets:
+            s.add(Or([var != value
+                      for arrays, ruleset in [((self.blue_dead, self.blue_live), blue),
+                                              ((self.orange_dead, self.orange_live), orange)]
+                      for arr, kind in zip(arrays, ['dead', 'live'])
+                      for var, value in zip(arr, ruleset[kind])]))
+
+        # ------------------------
+        # SYMMETRY BREAKING
+        # ------------------------
+        # Lex-leader constraints: the seed and rule variables, read in a fixed
+        # order, must be no larger than their image under every symmetry.
+        if symmetry_breaking:
+            order = self._symmetry_vars(DIHEDRAL_TRANSFORMS[0], False)
+            for transform, swap in self.symmetries[1:]:
+                s.add(lex_leq(order, self._symmetry_vars(transform, swap)))
+
+    def extend(self, last_step):
+        """
+        Encodes time steps up to last_step (at most max(periods)), adding
+        one transition at a time to the existing solver. Excluded
+        replications are ruled out as soon as their time step exists.
+        """
+        while len(self.state_blue) <= last_step:
+            t = len(self.state_blue) - 1
+            if self.encoding == "bitvec":
+                self._add_step_bitvec(t)
             else:
-                neighbors.append(0)
-    return Sum(neighbors)
+                self._add_step_int(t)
+            for (excluded_t, dx, dy) in self.exclude:
+                if excluded_t != t + 1:
+                    continue
+                condition = self._replication(excluded_t, dx, dy)
+                if condition is not None:
+                    self.s.add(Not(condition))
 
-# ------------------------
-# HELPER TO SELECT RULE VALUE
-# ------------------------
-def select_rule(rule_arr, count):
-    # Returns the element of rule_arr corresponding to a neighbor count.
-    # Unroll into a chain of If's (since count is an Int that can only be 0..8).
-    expr = rule_arr[0]
-    for i in range(1, 9):
-        expr = If(count == i, rule_arr[i], expr)
-    return expr
+    def _build_int(self):
+        grid_size, seed_start, s = self.grid_size, self.seed_start, self.s
 
-# ------------------------
-# TRANSITION CONSTRAINTS (EVOLUTION)
-# ------------------------
-# Use the update rules as follows:
-# For a cell at (r, c) at time t:
-#   Let nb = neighbor count from state_blue[t] and no = neighbor count from state_orange[t].
-#   Then the updates (for time t+1) are:
-#     If (B == 1 and O == 1) [i.e. cell is white]:
-#         new blue = select(orange_live, no)
-#         new orange = select(blue_live, nb)
-#     Otherwise:
-#         new blue = if B==1 then select(blue_live, nb) else select(blue_dead, nb)
-#         new orange = if O==1 then select(orange_live, no) else select(orange_dead, no)
-for t in range(steps - 1):
-    for r in range(grid_size):
-        for c in range(grid_size):
+        # ------------------------
+        # RULESET VARIABLES
+        # ------------------------
+        # Each ruleset (for blue and for orange) is represented by two arrays:
+        # one for a dead cell outcome [index = neighbor count] and one for a live cell.
+        # They are Int variables constrained to be either 0 or 1.
+        def create_ruleset(prefix):
+            dead = [Int(f"{prefix}_dead_{i}") for i in range(9)]
+            live = [Int(f"{prefix}_live_{i}") for i in range(9)]
+            for i in range(9):
+                s.add(Or(dead[i] == 0, dead[i] == 1))
+                s.add(Or(live[i] == 0, live[i] == 1))
+            # Prevent spontaneous birth in a dead cell with 0 neighbors.
+            s.add(dead[0] == 0)
+            return dead, live
+
+        self.blue_dead, self.blue_live = create_ruleset("blue")
+        self.orange_dead, self.orange_live = create_ruleset("orange")
+
+        self.state_blue, self.state_orange = [], []
+        self._add_layer_int(0)
+        state_blue, state_orange = self.state_blue, self.state_orange
+
+        # Define the initial conditions.
+        # The seed window is free; everywhere else the grid is dead.
+        for r in range(grid_size):
+            for c in range(grid_size):
+                if self._in_seed(r, c):
+                    # (r, c) is in the seed: no constraint so that all 4 states (dead, blue, orange, both) are allowed.
+                    pass
+                else:
+                    s.add(state_blue[0][r][c] == 0)
+                    s.add(state_orange[0][r][c] == 0)
+
+        # ------------------------
+        # ADDITIONAL CONSTRAINT
+        # ------------------------
+        # The starting seed must have at least one blue cell and at least one orange cell.
+        seed_cells = [(r, c) for r in range(seed_start, self.seed_end)
+                      for c in range(seed_start, self.seed_end)]
+        s.add(Or([state_blue[0][r][c] == 1 for r, c in seed_cells]))
+        s.add(Or([state_orange[0][r][c] == 1 for r, c in seed_cells]))
+
+    def _add_layer_int(self, t):
+        # ------------------------
+        # STATE VARIABLES
+        # ------------------------
+        # The blue and orange layers at time t over a grid_size x grid_size grid.
+        grid_size, s = self.grid_size, self.s
+        self.state_blue.append([[Int(f"B_{t}_{r}_{c}") if (r, c) in self.cones[t] else IntVal(0)
+                                 for c in range(grid_size)] for r in range(grid_size)])
+        self.state_orange.append([[Int(f"O_{t}_{r}_{c}") if (r, c) in self.cones[t] else IntVal(0)
+                                   for c in range(grid_size)] for r in range(grid_size)])
+
+        # Constrain all state variables to be 0 or 1.
+        for r, c in sorted(self.cones[t]):
+            s.add(Or(self.state_blue[t][r][c] == 0, self.state_blue[t][r][c] == 1))
+            s.add(Or(self.state_orange[t][r][c] == 0, self.state_orange[t][r][c] == 1))
+
+    def _add_step_int(self, t):
+        grid_size, s = self.grid_size, self.s
+        self._add_layer_int(t + 1)
+        state_blue, state_orange = self.state_blue, self.state_orange
+
+        # ------------------------
+        # TRANSITION CONSTRAINTS (EVOLUTION)
+        # ------------------------
+        # Use the update rules as follows:
+        # For a cell at (r, c) at time t:
+        #   Let nb = neighbor count from state_blue[t] and no = neighbor count from state_orange[t].
+        #   Then the updates (for time t+1) are:
+        #     If (B == 1 and O == 1) [i.e. cell is white]:
+        #         new blue = select(orange_live, no)
+        #         new orange = select(blue_live, nb)
+        #     Otherwise:
+        #         new blue = if B==1 then select(blue_live, nb) else select(blue_dead, nb)
+        #         new orange = if O==1 then select(orange_live, no) else select(orange_dead, no)
+        # Cells outside the next light cone have no live neighbors and stay dead.
+        # Since the grid is finite, out-of-bound neighbors count as dead, and so
+        # do neighbors outside the light cone. Each count is decoded once and
+        # each lookup built once per cell.
+        neighbors_of = neighbor_table(grid_size)
+        cone = self.cones[t]
+        for r, c in sorted(self.cones[t + 1]):
             B = state_blue[t][r][c]
             O = state_orange[t][r][c]
-            nb = neighbor_count(state_blue, t, r, c)
-            no = neighbor_count(state_orange, t, r, c)
+            neighbors = [(rr, cc) for rr, cc in neighbors_of[r][c] if (rr, cc) in cone]
+            nb = count_indicators(Sum([state_blue[t][rr][cc] for rr, cc in neighbors] + [IntVal(0)]))
+            no = count_indicators(Sum([state_orange[t][rr][cc] for rr, cc in neighbors] + [IntVal(0)]))
+            blue_live_nb = select_rule_indicators(nb, self.blue_live)
+            orange_live_no = select_rule_indicators(no, self.orange_live)
             new_B = If(And(B == 1, O == 1),
-                       select_rule(orange_live, no),
+                       orange_live_no,
                        If(B == 1,
-                          select_rule(blue_live, nb),
-                          select_rule(blue_dead, nb)))
+                          blue_live_nb,
+                          select_rule_indicators(nb, self.blue_dead)))
             new_O = If(And(B == 1, O == 1),
-                       select_rule(blue_live, nb),
+                       blue_live_nb,
                        If(O == 1,
-                          select_rule(orange_live, no),
-                          select_rule(orange_dead, no)))
+                          orange_live_no,
+                          select_rule_indicators(no, self.orange_dead)))
             s.add(state_blue[t+1][r][c] == new_B)
             s.add(state_orange[t+1][r][c] == new_O)
 
-# ------------------------
-# REPLICATION CONSTRAINT WITH ISOLATION
-# ------------------------
-# We require that there exists some time t in {1,...,steps-1} and an offset (dx, dy)
-# (from the eight neighboring positions) such that:
-# 1. The 3x3 seed at time 0 is exactly replicated (for both blue and orange) at the region
-#    shifted by (dx, dy) at time t.
-# 2. *All* cells in the grid outside this replicated 3x3 region are dead.
-allowed_offsets = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if not (dx == 0 and dy == 0)]
-replication_conditions = []
-for t in range(1, steps):
-    for (dx, dy) in allowed_offsets:
+    def _build_bitvec(self):
+        grid_size, s = self.grid_size, self.s
+
+        def create_ruleset(prefix):
+            dead = [BitVec(f"{prefix}_dead_{i}", 1) for i in range(9)]
+            live = [BitVec(f"{prefix}_live_{i}", 1) for i in range(9)]
+            # Prevent spontaneous birth in a dead cell with 0 neighbors.
+            s.add(dead[0] == 0)
+            return dead, live
+
+        self.blue_dead, self.blue_live = create_ruleset("blue")
+        self.orange_dead, self.orange_live = create_ruleset("orange")
+        # Each rule array spread across a row's lanes, built once.
+        self.lanes = {name: rule_lanes(rules, grid_size)
+                      for name, rules in [('blue_dead', self.blue_dead),
+                                          ('blue_live', self.blue_live),
+                                          ('orange_dead', self.orange_dead),
+                                          ('orange_live', self.orange_live)]}
+
+        self.rows_blue, self.rows_orange = [], []
+        self.state_blue, self.state_orange = [], []
+        self._add_layer_bitvec(0)
+
+        # The seed window is free; everywhere else the grid is dead, and the
+        # seed has at least one blue and at least one orange cell.
+        seed_mask = sum(1 << c for c in range(self.seed_start, self.seed_end))
+        for rows in [self.rows_blue, self.rows_orange]:
+            for r in range(grid_size):
+                if self.seed_start <= r < self.seed_end:
+                    s.add(rows[0][r] & ~seed_mask == 0)
+                else:
+                    s.add(rows[0][r] == 0)
+            s.add(Or([rows[0][r] != 0 for r in range(self.seed_start, self.seed_end)]))
+
+    def _add_layer_bitvec(self, t):
+        # One BitVec per row at time t, or the constant 0 for rows the cone misses.
+        grid_size = self.grid_size
+        for prefix, rows, state in [("B", self.rows_blue, self.state_blue),
+                                    ("O", self.rows_orange, self.state_orange)]:
+            layer = [BitVec(f"{prefix}_{t}_{r}", grid_size)
+                     if any((r, c) in self.cones[t] for c in range(grid_size))
+                     else BitVecVal(0, grid_size)
+                     for r in range(grid_size)]
+            rows.append(layer)
+            state.append([[Extract(c, c, row) for c in range(grid_size)] for row in layer])
+
+    def _add_step_bitvec(self, t):
+        # The transition rules of _add_step_int, applied to whole rows at once:
+        # white = B & O selects the swapped rules lane by lane.
+        s = self.s
+        self._add_layer_bitvec(t + 1)
+        for r in range(self.grid_size):
+            if is_bv_value(self.rows_blue[t + 1][r]):
+                continue
+            B = self.rows_blue[t][r]
+            O = self.rows_orange[t][r]
+            nb = bitvec_count(neighbor_rows(self.rows_blue[t], r))
+            no = bitvec_count(neighbor_rows(self.rows_orange[t], r))
+            white = B & O
+            blue_live_nb = select_rule_lanes(nb, self.lanes['blue_live'])
+            orange_live_no = select_rule_lanes(no, self.lanes['orange_live'])
+            new_B = (white & orange_live_no) | (~white & (
+                (B & blue_live_nb) | (~B & select_rule_lanes(nb, self.lanes['blue_dead']))))
+            new_O = (white & blue_live_nb) | (~white & (
+                (O & orange_live_no) | (~O & select_rule_lanes(no, self.lanes['orange_dead']))))
+            s.add(self.rows_blue[t + 1][r] == new_B)
+            s.add(self.rows_orange[t + 1][r] == new_O)
+
+    def _symmetry_vars(self, transform, swap):
+        # The seed and rule variables after applying a symmetry.
+        states = [self.state_blue, self.state_orange]
+        rules = [(self.blue_dead, self.blue_live), (self.orange_dead, self.orange_live)]
+        if swap:
+            states.reverse()
+            rules.reverse()
+        xs = []
+        for state in states:
+            for r in range(self.seed_size):
+                for c in range(self.seed_size):
+                    rr, cc = transform(r, c, self.seed_size)
+                    xs.append(state[0][self.seed_start + rr][self.seed_start + cc])
+        for dead, live in rules:
+            xs.extend(dead)
+            xs.extend(live)
+        return xs
+
+    def _in_seed(self, r, c):
+        return self.seed_start <= r < self.seed_end and self.seed_start <= c < self.seed_end
+
+    def _shift_in_bounds(self, dx, dy):
         # Check that shifting the seed region stays in bounds.
-        if seed_start + dx < 0 or seed_end - 1 + dx >= grid_size:
-            continue
-        if seed_start + dy < 0 or seed_end - 1 + dy >= grid_size:
-            continue
+        if self.seed_start + dx < 0 or self.seed_end - 1 + dx >= self.grid_size:
+            return False
+        if self.seed_start + dy < 0 or self.seed_end - 1 + dy >= self.grid_size:
+            return False
+        return True
+
+    def _replication(self, t, dx, dy):
+        # The replication-with-isolation condition at time t and offset
+        # (dx, dy), or None if the shifted seed would leave the grid.
+        if not self._shift_in_bounds(dx, dy):
+            return None
+        if self.encoding == "bitvec":
+            # Outside the seed window the grid starts dead, so both
+            # conditions together say: every row at time t is the time-0 row
+            # dx rows up, moved dy columns.
+            conds = []
+            for rows in [self.rows_blue, self.rows_orange]:
+                for r in range(self.grid_size):
+                    if 0 <= r - dx < self.grid_size:
+                        conds.append(rows[t][r] == shift_row(rows[0][r - dx], dy))
+                    else:
+                        conds.append(rows[t][r] == 0)
+            return And(conds)
         conds = []
         # Condition 1: Replication.
-        for r in range(seed_start, seed_end):
-            for c in range(seed_start, seed_end):
-                conds.append(state_blue[t][r+dx][c+dy] == state_blue[0][r][c])
-                conds.append(state_orange[t][r+dx][c+dy] == state_orange[0][r][c])
+        for r in range(self.seed_start, self.seed_end):
+            for c in range(self.seed_start, self.seed_end):
+                conds.append(self.state_blue[t][r+dx][c+dy] == self.state_blue[0][r][c])
+                conds.append(self.state_orange[t][r+dx][c+dy] == self.state_orange[0][r][c])
         # Condition 2: Isolation.
-        # Every cell not in the replicated block (i.e. not in the translated 3x3 region) must be dead.
-        for r in range(grid_size):
-            for c in range(grid_size):
-                if not (seed_start+dx <= r < seed_end+dx and seed_start+dy <= c < seed_end+dy):
-                    conds.append(state_blue[t][r][c] == 0)
-                    conds.append(state_orange[t][r][c] == 0)
-        replication_conditions.append(And(conds))
-s.add(Or(replication_conditions))
+        # Every cell not in the replicated block (i.e. not in the translated seed region) must be dead.
+        for r in range(self.grid_size):
+            for c in range(self.grid_size):
+                if not self._in_seed(r - dx, c - dy):
+                    conds.append(self.state_blue[t][r][c] == 0)
+                    conds.append(self.state_orange[t][r][c] == 0)
+        return And(conds)
 
-# ------------------------
-# (Additional constraint "replicate in less than 8 steps" is ensured by t in 1..steps-1)
-# ------------------------
+    def _replications(self, t):
+        # Replication at time t at any allowed offset.
+        conditions = [self._replication(t, dx, dy) for (dx, dy) in self.allowed_offsets]
+        return Or([condition for condition in conditions if condition is not None])
 
-# ------------------------
-# ENUMERATE ALL SOLUTIONS
-# ------------------------
-# We now enter a loop that finds and prints solutions and then blocks the current solution
-# so that the next call to s.check() finds a new one.
-solution_count = 0
-while s.check() == sat:
-    m = s.model()
-    solution_count += 1
+    def replication_offset(self, blue, orange, t):
+        # Python mirror of _replication for concrete states blue[t][r][c] /
+        # orange[t][r][c]: the allowed offset the seed sits at at time t, or None.
+        for (dx, dy) in self.allowed_offsets:
+            if not self._shift_in_bounds(dx, dy):
+                continue
+            ok = True
+            for r in range(self.grid_size):
+                for c in range(self.grid_size):
+                    if self._in_seed(r - dx, c - dy):
+                        ok = ok and blue[t][r][c] == blue[0][r-dx][c-dy] \
+                            and orange[t][r][c] == orange[0][r-dx][c-dy]
+                    else:
+                        ok = ok and blue[t][r][c] == 0 and orange[t][r][c] == 0
+            if ok:
+                return (dx, dy)
+        return None
+
+    def used_rule_entries(self, blue, orange, last_step):
+        # The (layer, 'dead' | 'live', neighbor count) rule entries consulted while
+        # stepping from time 0 to last_step, following the transition rules above.
+        grid_size = self.grid_size
+        neighbors_of = neighbor_table(grid_size)
+        used = set()
+        for t in range(last_step):
+            for r in range(grid_size):
+                for c in range(grid_size):
+                    nb = sum(blue[t][rr][cc] for rr, cc in neighbors_of[r][c])
+                    no = sum(orange[t][rr][cc] for rr, cc in neighbors_of[r][c])
+                    if blue[t][r][c] == 1 and orange[t][r][c] == 1:
+                        used.add(('orange', 'live', no))
+                        used.add(('blue', 'live', nb))
+                    else:
+                        used.add(('blue', 'live' if blue[t][r][c] else 'dead', nb))
+                        used.add(('orange', 'live' if orange[t][r][c] else 'dead', no))
+        return used
+
+    def _walker(self, m, enumerate_families):
+        # Reads a structured walker out of a model: both seed layers, the four
+        # rule arrays, and the first accepted period and offset it replicates at.
+        seed_rows = range(self.seed_start, self.seed_end)
+        walker = {
+            'seed_blue': [[m.evaluate(self.state_blue[0][r][c]).as_long() for c in seed_rows]
+                          for r in seed_rows],
+            'seed_orange': [[m.evaluate(self.state_orange[0][r][c]).as_long() for c in seed_rows]
+                            for r in seed_rows],
+            'blue': {'dead': [m.evaluate(self.blue_dead[i]).as_long() for i in range(9)],
+                     'live': [m.evaluate(self.blue_live[i]).as_long() for i in range(9)]},
+            'orange': {'dead': [m.evaluate(self.orange_dead[i]).as_long() for i in range(9)],
+                       'live': [m.evaluate(self.orange_live[i]).as_long() for i in range(9)]},
+        }
+        blue = [[[m.evaluate(v).as_long() for v in row] for row in layer] for layer in self.state_blue]
+        orange = [[[m.evaluate(v).as_long() for v in row] for row in layer] for layer in self.state_orange]
+        for t in [t for t in self.periods if t < len(blue)]:
+            offset = self.replication_offset(blue, orange, t)
+            if offset is not None:
+                walker['period'], walker['offset'] = t, list(offset)
+                break
+        if enumerate_families:
+            # Rule entries the walker never consults before it first
+            # replicates are reported as None ("either value").
+            model = {layer: {kind: list(walker[layer][kind]) for kind in ['dead', 'live']}
+                     for layer in ['blue', 'orange']}
+            used = self.used_rule_entries(blue, orange, walker['period'])
+            for layer in ['blue', 'orange']:
+                for kind in ['dead', 'live']:
+                    for i in range(9):
+                        if (layer, kind, i) not in used and (kind, i) != ('dead', 0):
+                            walker[layer][kind][i] = None
+            # A family that contains an excluded pair would report that pair's
+            # walker again (screen_seeds already has). Such a family is cut
+            # into disjoint pieces that leave the pair out: don't-care entries
+            # are fixed to the model's values, in order, up to the first one
+            # where the model differs from the pair. Every member of a piece
+            # is cut to the same piece, so later checks find the others once.
+            entries = [(layer, kind, i) for layer in ['blue', 'orange']
+                       for kind in ['dead', 'live'] for i in range(9)]
+            for blue_rules, orange_rules in self.exclude_rulesets:
+                excluded = {'blue': blue_rules, 'orange': orange_rules}
+                if all(walker[layer][kind][i] in (None, excluded[layer][kind][i])
+                       for layer, kind, i in entries):
+                    for layer, kind, i in entries:
+                        if walker[layer][kind][i] is None:
+                            walker[layer][kind][i] = model[layer][kind][i]
+                            if model[layer][kind][i] != excluded[layer][kind][i]:
+                                break
+        return walker
+
+    def block(self, walker):
+        # Build a blocking clause on the free variables that determine the solution (seed and rulesets).
+        block = []
+        for i, r in enumerate(range(self.seed_start, self.seed_end)):
+            for j, c in enumerate(range(self.seed_start, self.seed_end)):
+                block.append(self.state_blue[0][r][c] != walker['seed_blue'][i][j])
+                block.append(self.state_orange[0][r][c] != walker['seed_orange'][i][j])
+        for layer, dead, live in [('blue', self.blue_dead, self.blue_live),
+                                  ('orange', self.orange_dead, self.orange_live)]:
+            for i in range(9):
+                # None marks a don't-care entry of a ruleset family.
+                if walker[layer]['dead'][i] is not None:
+                    block.append(dead[i] != walker[layer]['dead'][i])
+                if walker[layer]['live'][i] is not None:
+                    block.append(live[i] != walker[layer]['live'][i])
+        self.s.add(Or(block))
+
+    def check(self, *assumptions):
+        # self.s.check, through the telemetry if there is one.
+        if self.telemetry is None:
+            return self.s.check(*assumptions)
+        return self.telemetry.check(self.s, *assumptions)
+
+    def cache_key(self, enumerate_families=False):
+        return cache_key("multi_layer_search", grid_size=self.grid_size, periods=self.periods,
+                         seed_start=self.seed_start, seed_size=self.seed_size,
+                         allowed_offsets=self.allowed_offsets, exclude=self.exclude,
+                         families=enumerate_families,
+                         **({'symmetry_breaking': True} if self.symmetry_breaking else {}),
+                         **({'exclude_rulesets': self.exclude_rulesets}
+                            if self.exclude_rulesets else {}))
+
+    def walkers(self, enumerate_families=False, cache=None, limit=None):
+        """
+        Enumerates walkers, blocking each one after it is found. When
+        enumerate_families is True, each result is a family of rulesets with
+        None for don't-care entries and costs a single solver call. If cache
+        (a ResultCache) is given, walkers are appended to its item list as they
+        are found, and a later call streams them back and blocks them before
+        continuing; the key's value marks the enumeration complete. Stops after
+        limit walkers if limit is given. If a telemetry limit cuts a check
+        short, the enumeration ends there and is not recorded as complete.
+        """
+        if self.incremental:
+            raise ValueError("an incremental WalkerSearch enumerates with first_period_walkers")
+        key = self.cache_key(enumerate_families)
+        complete = cache is not None and cache.get(key, False)
+
+        # Replay what an earlier run already found and block it.
+        count = 0
+        for walker in cache.items(key) if cache is not None else []:
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            self.block(walker)
+            yield walker
+
+        while not complete and (limit is None or count < limit):
+            result = self.check()
+            if result == unknown:
+                return
+            if result != sat:
+                if cache is not None:
+                    cache.put(key, True)
+                break
+            walker = self._walker(self.s.model(), enumerate_families)
+            count += 1
+            self.block(walker)
+            if cache is not None:
+                cache.append(key, walker)
+            yield walker
+
+    def first_period_walkers(self, enumerate_families=False, limit=None):
+        """
+        Bounded model checking over the period: encodes one more time step
+        per period in ascending order, checks for a replication there under
+        an assumption literal, and enumerates the walkers of the first period
+        that has any. No walker replicates earlier, so these are exactly the
+        walkers whose period is the smallest possible. Stops after limit
+        walkers if limit is given, or when a telemetry limit cuts a check
+        short.
+        """
+        s = self.s
+        count = 0
+        for t in self.periods:
+            self.extend(t)
+            goal = Bool(f"replicates_at_{t}")
+            s.add(Implies(goal, self._replications(t)))
+            result = self.check(goal)
+            if result == unknown:
+                return
+            if result != sat:
+                # Retire the literal so the solver can drop its clauses.
+                s.add(Not(goal))
+                continue
+            # The model of the sat check above is the first walker; later
+            # ones need a check after each block.
+            while limit is None or count < limit:
+                walker = self._walker(s.model(), enumerate_families)
+                count += 1
+                self.block(walker)
+                yield walker
+                if self.check(goal) != sat:
+                    break
+            return
+
+def _make_telemetry(options, label):
+    # A SolverTelemetry from find_walkers' telemetry options; progress lines
+    # go to stderr.
+    if options is None:
+        return None
+    stream = sys.stderr if options.get('progress_interval') else None
+    return SolverTelemetry(**options, label=label, progress_stream=stream)
+
+def _cut_short(telemetry):
+    # Why the latest search was cut short by a telemetry limit, or None.
+    return None if telemetry is None else telemetry.last_reason
+
+def _solve_subproblem(args):
+    # Worker entry point for find_walkers: one (period, offset) subproblem.
+    # Also returns why it was cut short (None if it finished).
+    (index, search_args, enumerate_families, limit, encoding, telemetry_options,
+     solver_config) = args
+    label = f"period {search_args['periods'][0]} offset {tuple(search_args['allowed_offsets'][0])}"
+    telemetry = _make_telemetry(telemetry_options, label)
+    try:
+        search = WalkerSearch(**search_args, encoding=encoding, telemetry=telemetry,
+                              solver_config=solver_config)
+        walkers = list(search.walkers(enumerate_families, limit=limit))
+        return index, walkers, _cut_short(telemetry)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+
+def _race_walkers(solver_config, search_args, enumerate_families, limit, telemetry_options):
+    # One portfolio entry of find_walkers: the whole enumeration under one
+    # solver config. A run cut short must not win the race, so it raises.
+    telemetry = _make_telemetry(telemetry_options or {}, solver_config)
+    try:
+        search = WalkerSearch(**search_args, telemetry=telemetry, solver_config=solver_config)
+        if search.incremental:
+            walkers = list(search.first_period_walkers(enumerate_families, limit))
+        else:
+            walkers = list(search.walkers(enumerate_families, limit=limit))
+        if _cut_short(telemetry) is not None:
+            raise RuntimeError(f"cut short ({telemetry.last_reason})")
+        return walkers
+    finally:
+        telemetry.close()
+
+def find_walkers(grid_size=9, periods=range(1, 8), seed_start=4, seed_size=3,
+                 allowed_offsets=ALL_OFFSETS, use_light_cone=True, enumerate_families=False,
+                 split=False, workers=None, first_only=False, cache_path=None,
+                 symmetry_breaking=False, expand_orbits=True, screen_rulesets=(),
+                 verify=False, encoding="int", incremental=False, telemetry=None,
+                 solver_config=None, portfolio=None):
+    """
+    Runs a walker search and yields structured walkers (see WalkerSearch).
+
+    Without split, this is one query over all periods and offsets. With
+    split, the search is cut into one subproblem per (period, offset) that
+    requires it to be the walker's first accepted replication; the
+    subproblems are disjoint, together find the same walkers, and run
+    concurrently on workers processes. With first_only, the search stops at
+    the first walker found. cache_path names a ResultCache used to resume:
+    the whole enumeration without split, finished subproblems with split.
+
+    With symmetry_breaking, only one walker per symmetry orbit is searched
+    for (and with split, only one offset per orbit of offsets); if
+    expand_orbits is also set, each one is followed by the other members
+    of its orbit, so the output covers the same walkers as without.
+
+    screen_rulesets lists (blue, orange) ruleset pairs whose seeds are all
+    simulated with NumPy first (multi_numpy.screen_seeds); the walkers found
+    that way are yielded up front and the solver only searches the other
+    ruleset pairs. With verify, every walker the solver reports is checked
+    by simulation and a RuntimeError is raised on a mismatch. encoding picks
+    the WalkerSearch encoding; it does not change the walkers found.
+
+    With incremental, the time steps are added one period at a time
+    (WalkerSearch.first_period_walkers) and only the walkers of the smallest
+    period that has any are reported (screened walkers are still reported in
+    full). It cannot be combined with split, and cache_path is not used.
+
+    telemetry is a dict of telemetry.SolverTelemetry keyword arguments (file
+    path, progress interval, limits); every search gets its own
+    SolverTelemetry built from it, so with split each subproblem has its own
+    total_timeout. Progress lines go to stderr. A search cut short by a limit
+    yields what it found, reports the reason on stderr and is not cached as
+    finished.
+
+    solver_config picks the portfolio.SOLVER_CONFIGS entry every solver is
+    built with. With portfolio (a portfolio.Portfolio), the search is raced
+    under each of its configurations in parallel processes instead and the
+    walkers of the first to finish are yielded; it cannot be combined with
+    split, and cache_path is not used.
+    """
+    if incremental and split:
+        raise ValueError("incremental search cannot be combined with split")
+    if portfolio is not None and split:
+        raise ValueError("a portfolio race cannot be combined with split")
+    cache = ResultCache(cache_path) if cache_path else None
+    search_telemetry = None
+    limit = 1 if first_only else None
+    periods = sorted(periods)
+    symmetries = walker_symmetries(grid_size, seed_start, seed_size, allowed_offsets)
+
+    def expand(walkers):
+        for walker in walkers:
+            if verify:
+                from multi_numpy import verify_walker
+                if not verify_walker(walker, grid_size, seed_start, periods, allowed_offsets):
+                    raise RuntimeError(f"walker failed verification by simulation: {walker}")
+            if symmetry_breaking and expand_orbits:
+                yield from expand_walker_orbit(walker, symmetries)
+            else:
+                yield walker
+
+    screened = []
+    for blue, orange in screen_rulesets:
+        pairs = [[blue, orange], [orange, blue]] if symmetry_breaking else [[blue, orange]]
+        # The colour-swapped pair is screened too so that the excluded pairs
+        # stay closed under the symmetries.
+        for pair in pairs:
+            if pair not in screened:
+                screened.append(pair)
+    if screened:
+        from multi_numpy import screen_seeds
+        for blue, orange in screened:
+            for walker in screen_seeds(blue, orange, grid_size, seed_start, seed_size, periods,
+                                       allowed_offsets):
+                yield walker
+                if first_only:
+                    return
+
+    try:
+        if incremental or not split:
+            search_args = dict(grid_size=grid_size, periods=periods, seed_start=seed_start,
+                               seed_size=seed_size, allowed_offsets=allowed_offsets,
+                               use_light_cone=use_light_cone,
+                               symmetry_breaking=symmetry_breaking, exclude_rulesets=screened,
+                               encoding=encoding, incremental=incremental)
+            if portfolio is not None:
+                problem_class = dict(query="walkers", grid_size=grid_size, periods=periods,
+                                     seed_size=seed_size, allowed_offsets=allowed_offsets,
+                                     encoding=encoding, families=enumerate_families,
+                                     incremental=incremental)
+                yield from expand(portfolio.race(
+                    _race_walkers, (search_args, enumerate_families, limit, telemetry),
+                    problem_class, encoding))
+                return
+            search_telemetry = _make_telemetry(telemetry, None)
+            search = WalkerSearch(**search_args, telemetry=search_telemetry,
+                                  solver_config=solver_config)
+            if incremental:
+                yield from expand(search.first_period_walkers(enumerate_families, limit))
+            else:
+                yield from expand(search.walkers(enumerate_families, cache, limit))
+            reason = _cut_short(search_telemetry)
+            if reason is not None:
+                print(f"Search cut short ({reason}); the walkers found are partial.",
+                      file=sys.stderr)
+            return
+
+        offsets = [tuple(offset) for offset in allowed_offsets]
+        if symmetry_breaking:
+            # Subproblems whose offsets are images of each other hold images
+            # of each other's walkers; keep the first offset of each orbit.
+            offsets = [offset for i, offset in enumerate(offsets)
+                       if not any(_transform_offset(transform, *offset) in offsets[:i]
+                                  for transform, _ in symmetries)]
+        pending = []
+        for t in periods:
+            for offset in offsets:
+                search_args = dict(grid_size=grid_size, periods=[t], seed_start=seed_start,
+                                   seed_size=seed_size, allowed_offsets=[offset],
+                                   use_light_cone=use_light_cone,
+                                   exclude=[(earlier, dx, dy) for earlier in periods if earlier < t
+                                            for dx, dy in allowed_offsets])
+                if symmetry_breaking:
+                    search_args['symmetry_breaking'] = True
+                if screened:
+                    search_args['exclude_rulesets'] = screened
+                key = cache_key("multi_layer_split", families=enumerate_families,
+                                **search_args)
+                if cache is None or not cache.get(key, False):
+                    pending.append((key, search_args))
+                    continue
+                done = list(itertools.islice(cache.items(key), limit))
+                yield from expand(done)
+                if first_only and done:
+                    return
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers or os.cpu_count()) as pool:
+            tasks = [(index, search_args, enumerate_families, limit, encoding, telemetry,
+                      solver_config)
+                     for index, (_, search_args) in enumerate(pending)]
+            for index, walkers, reason in pool.imap_unordered(_solve_subproblem, tasks):
+                if reason is not None:
+                    print(f"Subproblem {index} cut short ({reason}); its walkers are partial.",
+                          file=sys.stderr)
+                elif cache is not None and not first_only:
+                    # Drop rows a run that crashed before its marker left.
+                    cache.clear_items(pending[index][0])
+                    cache.extend(pending[index][0], walkers)
+                    cache.put(pending[index][0], True)
+                yield from expand(walkers)
+                if first_only and walkers:
+                    pool.terminate()
+                    return
+    finally:
+        if cache is not None:
+            cache.close()
+        if search_telemetry is not None:
+            search_telemetry.close()
+
+def print_walker(solution_count, walker):
     print("Solution", solution_count)
-    
-    # Print the seed pattern (only the free 3x3 area) for both layers.
+    print("Period:", walker['period'], "offset:", tuple(walker['offset']))
+
+    # Print the seed pattern (only the free seed area) for both layers.
     print("Seed pattern (blue layer):")
-    for r in range(seed_start, seed_end):
-        row = [m.evaluate(state_blue[0][r][c]) for c in range(seed_start, seed_end)]
+    for row in walker['seed_blue']:
         print(row)
     print("Seed pattern (orange layer):")
-    for r in range(seed_start, seed_end):
-        row = [m.evaluate(state_orange[0][r][c]) for c in range(seed_start, seed_end)]
+    for row in walker['seed_orange']:
         print(row)
-    
+
     # Print the rulesets.
-    print("Blue ruleset, dead:", [m.evaluate(blue_dead[i]) for i in range(9)])
-    print("Blue ruleset, live:", [m.evaluate(blue_live[i]) for i in range(9)])
-    print("Orange ruleset, dead:", [m.evaluate(orange_dead[i]) for i in range(9)])
-    print("Orange ruleset, live:", [m.evaluate(orange_live[i]) for i in range(9)])
+    print("Blue ruleset, dead:", walker['blue']['dead'])
+    print("Blue ruleset, live:", walker['blue']['live'])
+    print("Orange ruleset, dead:", walker['orange']['dead'])
+    print("Orange ruleset, live:", walker['orange']['live'])
     print("-------------------------------------")
-    
-    # Build a blocking clause on the free variables that determine the solution (seed and rulesets).
-    block = []
-    for r in range(seed_start, seed_end):
-        for c in range(seed_start, seed_end):
-            block.append(state_blue[0][r][c] != m.evaluate(state_blue[0][r][c]))
-            block.append(state_orange[0][r][c] != m.evaluate(state_orange[0][r][c]))
-    for i in range(9):
-        block.append(blue_dead[i] != m.evaluate(blue_dead[i]))
-        block.append(blue_live[i] != m.evaluate(blue_live[i]))
-        block.append(orange_dead[i] != m.evaluate(orange_dead[i]))
-        block.append(orange_live[i] != m.evaluate(orange_live[i]))
-    s.add(Or(block))
-
-print("Total solutions found:", solution_count) 
\ No newline at end of file
+
+def _int_range(text):
+    # Parses "a:b" (inclusive) or a single integer into a range.
+    first, _, last = text.partition(":")
+    return range(int(first), int(last or first) + 1)
+
+def _offsets(text):
+    # Parses a named offset set or "dx,dy;dx,dy;...".
+    if text in OFFSET_SETS:
+        return OFFSET_SETS[text]
+    return [tuple(int(v) for v in pair.split(",")) for pair in text.split(";")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search for two-layer CA walkers.")
+    parser.add_argument("--grid-size", default="9",
+                        help='grid side, or "auto" for the light-cone size with a centred seed')
+    parser.add_argument("--periods", type=_int_range, default=_int_range("1:7"),
+                        help='replication times to accept, e.g. "1:7"')
+    parser.add_argument("--seed-start", type=int, default=4)
+    parser.add_argument("--seed-size", type=int, default=3)
+    parser.add_argument("--offsets", type=_offsets, default=ALL_OFFSETS,
+                        help='"all", "orthogonal", "diagonal" or "dx,dy;dx,dy;..."')
+    parser.add_argument("--encoding", choices=ENCODINGS, default="int",
+                        help="per-cell Int variables or row-packed BitVecs")
+    parser.add_argument("--no-light-cone", action="store_true",
+                        help="give every cell state variables at every step")
+    parser.add_argument("--families", action="store_true",
+                        help="report ruleset families with None for don't-care entries")
+    parser.add_argument("--split", action="store_true",
+                        help="solve each (period, offset) subproblem separately in parallel")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --split (default: one per core)")
+    parser.add_argument("--first", action="store_true", help="stop at the first walker")
+    parser.add_argument("--incremental", action="store_true",
+                        help="add one period at a time and report only the smallest period's walkers")
+    parser.add_argument("--symmetry-breaking", action="store_true",
+                        help="search one walker per colour-swap/rotation/reflection orbit")
+    parser.add_argument("--no-expand", action="store_true",
+                        help="with --symmetry-breaking, print only the canonical walkers")
+    parser.add_argument("--screen", default=None,
+                        help="JSONL of walkers or {blue, orange} concrete ruleset pairs whose "
+                             "seeds are all simulated before the solver searches the rest")
+    parser.add_argument("--verify", action="store_true",
+                        help="check every solver walker by NumPy simulation")
+    parser.add_argument("--cache", default="csp_z3_results.db",
+                        help='SQLite result cache used to resume ("" to disable)')
+    parser.add_argument("--output", default=None, help="also append walkers to this JSONL file")
+    parser.add_argument("--store", default=None,
+                        help="also pack walkers into this result store (see result_store.py)")
+    parser.add_argument("--events", default=None,
+                        help="append one JSON line per solver check and progress report here")
+    parser.add_argument("--progress", type=float, default=None,
+                        help="seconds between progress reports on stderr")
+    parser.add_argument("--query-timeout", type=float, default=None,
+                        help="seconds allowed per solver check")
+    parser.add_argument("--total-timeout", type=float, default=None,
+                        help="seconds allowed per search (per subproblem with --split)")
+    parser.add_argument("--max-memory-mb", type=float, default=None,
+                        help="peak resident memory at which a search stops")
+    parser.add_argument("--solver-config", default="smt",
+                        choices=list(SOLVER_CONFIGS) + ["auto"],
+                        help='Z3 configuration to solve with; "auto" picks the most frequent '
+                             "winner recorded in --portfolio-wins for this search")
+    parser.add_argument("--portfolio", default=None,
+                        help='race these solver configurations ("all" or "smt,qf_fd,...") '
+                             "in parallel processes and take the first result")
+    parser.add_argument("--portfolio-wins", default=None,
+                        help="SQLite file that records which configuration won each race")
+    args = parser.parse_args(argv)
+
+    seed_start = args.seed_start
+    if args.grid_size == "auto":
+        # The smallest grid that holds the seed's whole light cone.
+        grid_size = light_cone_grid_size(args.seed_size, max(args.periods))
+        seed_start = max(args.periods)
+    else:
+        grid_size = int(args.grid_size)
+
+    screen_rulesets = []
+    if args.screen:
+        with open(args.screen) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    screen_rulesets.append((record['blue'], record['orange']))
+
+    telemetry = None
+    if (args.events or args.progress or args.query_timeout or args.total_timeout or
+            args.max_memory_mb):
+        telemetry = dict(path=args.events, progress_interval=args.progress,
+                         query_timeout=args.query_timeout, total_timeout=args.total_timeout,
+                         max_memory_mb=args.max_memory_mb)
+
+    portfolio = None
+    solver_config = args.solver_config
+    if args.portfolio:
+        configs = None if args.portfolio == "all" else args.portfolio.split(",")
+        portfolio = Portfolio(configs, args.workers, args.portfolio_wins)
+    elif solver_config == "auto":
+        problem_class = dict(query="walkers", grid_size=grid_size, periods=sorted(args.periods),
+                             seed_size=args.seed_size, allowed_offsets=args.offsets,
+                             encoding=args.encoding, families=args.families,
+                             incremental=args.incremental)
+        solver_config = Portfolio(wins_path=args.portfolio_wins).best(problem_class, args.encoding)
+
+    out = open(args.output, "a") if args.output else None
+    # The store records the search grid, so exports show the walker on it.
+    store = (ResultStore(args.store, "walker", args.seed_size, grid_size, seed_start)
+             if args.store else None)
+    solution_count = 0
+    try:
+        for walker in find_walkers(grid_size, args.periods, seed_start, args.seed_size,
+                                   args.offsets, not args.no_light_cone, args.families,
+                                   args.split, args.workers, args.first, args.cache or None,
+                                   args.symmetry_breaking, not args.no_expand, screen_rulesets,
+                                   args.verify, args.encoding, args.incremental, telemetry,
+                                   solver_config, portfolio):
+            solution_count += 1
+            print_walker(solution_count, walker)
+            if out:
+                out.write(json.dumps(walker) + "\n")
+                out.flush()
+            if store is not None:
+                store.add(walker)
+    finally:
+        if out:
+            out.close()
+
+    print("Total solutions found:", solution_count)
+
+if __name__ == "__main__":
+    main()
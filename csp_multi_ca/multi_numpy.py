@@ -0,0 +1,181 @@
+"""
+NumPy simulator of the two-layer (blue/orange) update that csp_z3.py encodes
+and ca.js runs, including the rule swap on white cells. It advances a whole
+batch of (seed, ruleset pair) combinations at once, and is used to verify
+walkers reported by the solver and to screen every seed under a candidate
+ruleset pair before the solver is asked about the rest.
+"""
+import os
+import sys
+
+import numpy as np
+
+# neighbor_counts is shared with the single-layer simulator.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "CSP_Cellular_Automata"))
+from ca_numpy import neighbor_counts
+
+def rule_tables(rulesets, batch):
+    """
+    Turns one {'dead': [...], 'live': [...]} ruleset, or a list of batch of
+    them, into two (batch, 9) uint8 lookup tables, dead and live.
+    """
+    if isinstance(rulesets, dict):
+        rulesets = [rulesets]
+    dead = np.array([ruleset['dead'] for ruleset in rulesets], dtype=np.uint8)
+    live = np.array([ruleset['live'] for ruleset in rulesets], dtype=np.uint8)
+    return np.broadcast_to(dead, (batch, 9)), np.broadcast_to(live, (batch, 9))
+
+def step_batch(blue, orange, blue_rules, orange_rules, wrap_around=False):
+    """
+    Advances batches of blue and orange grids (batch, n, n) by one step.
+    blue_rules and orange_rules are (dead, live) pairs of (batch, 9) lookup
+    tables, one row per batch entry. As in ca.js, a white cell (alive in both
+    layers) takes its new blue state from the orange live rule and orange
+    neighbors, and its new orange state from the blue live rule and blue
+    neighbors.
+    """
+    batch = blue.shape[0]
+    nb = neighbor_counts(blue, wrap_around).reshape(batch, -1)
+    no = neighbor_counts(orange, wrap_around).reshape(batch, -1)
+    b = blue.reshape(batch, -1).astype(bool)
+    o = orange.reshape(batch, -1).astype(bool)
+    blue_dead, blue_live = blue_rules
+    orange_dead, orange_live = orange_rules
+    blue_live_nb = np.take_along_axis(blue_live, nb, axis=1)
+    orange_live_no = np.take_along_axis(orange_live, no, axis=1)
+    new_blue = np.where(b, blue_live_nb, np.take_along_axis(blue_dead, nb, axis=1))
+    new_orange = np.where(o, orange_live_no, np.take_along_axis(orange_dead, no, axis=1))
+    white = b & o
+    new_blue = np.where(white, orange_live_no, new_blue)
+    new_orange = np.where(white, blue_live_nb, new_orange)
+    return (new_blue.reshape(blue.shape).astype(np.uint8),
+            new_orange.reshape(orange.shape).astype(np.uint8))
+
+def seeds_from_ids(seed_ids, seed_size=3):
+    """
+    Decodes seed ids in [0, 4**(seed_size**2)) into (len(seed_ids),
+    seed_size, seed_size) blue and orange seed windows. Bit j of an id is
+    blue cell j and bit seed_size**2 + j is orange cell j, row-major.
+    """
+    cells = seed_size * seed_size
+    ids = np.asarray(seed_ids, dtype=np.int64)[:, None]
+    blue = ((ids >> np.arange(cells)) & 1).astype(np.uint8)
+    orange = ((ids >> (cells + np.arange(cells))) & 1).astype(np.uint8)
+    shape = (ids.shape[0], seed_size, seed_size)
+    return blue.reshape(shape), orange.reshape(shape)
+
+def first_replication(seed_blue, seed_orange, blue_rules, orange_rules, grid_size, seed_start,
+                      periods, allowed_offsets):
+    """
+    Simulates a batch of seeds on a bounded grid_size x grid_size grid with
+    the seed windows at rows/cols seed_start .. seed_start + seed_size - 1,
+    and finds, like csp_z3.WalkerSearch, the first time in periods at which
+    each seed reappears at one of allowed_offsets (dx shifts rows, dy shifts
+    columns) with every other cell dead.
+
+    Parameters:
+      seed_blue, seed_orange    - (batch, seed_size, seed_size) seed windows
+      blue_rules, orange_rules  - (dead, live) pairs of (batch, 9) tables
+      grid_size                 - side of the simulated grid
+      seed_start                - row/col of the seed window's top-left cell
+      periods                   - replication times to accept
+      allowed_offsets           - (dx, dy) offsets to accept, in order
+
+    Returns:
+      Two int arrays of length batch: the period (0 where the seed never
+      replicates) and the index into allowed_offsets (-1 where it never does).
+    """
+    batch, seed_size = seed_blue.shape[0], seed_blue.shape[1]
+    seed_end = seed_start + seed_size
+    blue = np.zeros((batch, grid_size, grid_size), dtype=np.uint8)
+    orange = np.zeros((batch, grid_size, grid_size), dtype=np.uint8)
+    blue[:, seed_start:seed_end, seed_start:seed_end] = seed_blue
+    orange[:, seed_start:seed_end, seed_start:seed_end] = seed_orange
+    seed_population = (seed_blue.reshape(batch, -1).sum(axis=1) +
+                       seed_orange.reshape(batch, -1).sum(axis=1))
+
+    period = np.zeros(batch, dtype=np.int64)
+    offset_index = np.full(batch, -1, dtype=np.int64)
+    periods = set(periods)
+    for t in range(1, max(periods) + 1):
+        blue, orange = step_batch(blue, orange, blue_rules, orange_rules)
+        if t not in periods:
+            continue
+        population = (blue.reshape(batch, -1).sum(axis=1) +
+                      orange.reshape(batch, -1).sum(axis=1))
+        # Isolation holds when the whole grid has exactly the seed's
+        # population, and the shifted window equals the seed.
+        candidates = (period == 0) & (population == seed_population)
+        for k, (dx, dy) in enumerate(allowed_offsets):
+            top, left = seed_start + dx, seed_start + dy
+            if top < 0 or left < 0 or top + seed_size > grid_size or left + seed_size > grid_size:
+                continue
+            window = (slice(None), slice(top, top + seed_size), slice(left, left + seed_size))
+            hit = candidates & (blue[window] == seed_blue).all(axis=(1, 2)) \
+                & (orange[window] == seed_orange).all(axis=(1, 2))
+            period[hit] = t
+            offset_index[hit] = k
+            candidates &= ~hit
+    return period, offset_index
+
+def verify_walker(walker, grid_size, seed_start, periods, allowed_offsets):
+    """
+    Checks a structured walker (see csp_z3.WalkerSearch) by simulation: True
+    when it first replicates at exactly its reported period and offset. For
+    a ruleset family, both all-0 and all-1 fillings of its None entries are
+    checked.
+    """
+    seed_blue = np.array([walker['seed_blue']] * 2, dtype=np.uint8)
+    seed_orange = np.array([walker['seed_orange']] * 2, dtype=np.uint8)
+    rules = []
+    for layer in ['blue', 'orange']:
+        fillings = [{kind: [fill if v is None else v for v in walker[layer][kind]]
+                     for kind in ['dead', 'live']} for fill in [0, 1]]
+        rules.append(rule_tables(fillings, 2))
+    period, offset_index = first_replication(seed_blue, seed_orange, rules[0], rules[1],
+                                             grid_size, seed_start, periods, allowed_offsets)
+    expected = [tuple(offset) for offset in allowed_offsets].index(tuple(walker['offset']))
+    return bool((period == walker['period']).all() and (offset_index == expected).all())
+
+def screen_seeds(blue, orange, grid_size, seed_start, seed_size, periods, allowed_offsets,
+                 sample=None, chunk_size=1 << 14, seed=None):
+    """
+    Runs every seed with at least one blue and one orange cell (or, with
+    sample, that many random seed ids) under one ruleset pair and yields the
+    walkers among them, in the structure csp_z3.WalkerSearch reports.
+
+    Parameters:
+      blue, orange   - {'dead': [...], 'live': [...]} rulesets
+      grid_size, seed_start, seed_size, periods, allowed_offsets
+                     - as for csp_z3.WalkerSearch
+      sample         - number of random seed ids to draw (duplicates are
+                       dropped) instead of trying all 4**(seed_size**2)
+      chunk_size     - number of seeds simulated together; bounds memory use
+      seed           - seed for the random sample
+    """
+    allowed_offsets = [tuple(offset) for offset in allowed_offsets]
+    num_seeds = 4 ** (seed_size * seed_size)
+    if sample is None:
+        seed_ids = np.arange(num_seeds, dtype=np.int64)
+    else:
+        seed_ids = np.unique(np.random.default_rng(seed).integers(0, num_seeds, size=sample,
+                                                                dtype=np.int64))
+    for first in range(0, seed_ids.shape[0], chunk_size):
+        ids = seed_ids[first:first + chunk_size]
+        seed_blue, seed_orange = seeds_from_ids(ids, seed_size)
+        keep = seed_blue.any(axis=(1, 2)) & seed_orange.any(axis=(1, 2))
+        seed_blue, seed_orange = seed_blue[keep], seed_orange[keep]
+        batch = seed_blue.shape[0]
+        period, offset_index = first_replication(
+            seed_blue, seed_orange, rule_tables(blue, batch), rule_tables(orange, batch),
+            grid_size, seed_start, periods, allowed_offsets)
+        for i in np.flatnonzero(period):
+            yield {
+                'seed_blue': seed_blue[i].tolist(),
+                'seed_orange': seed_orange[i].tolist(),
+                'blue': {kind: list(blue[kind]) for kind in ['dead', 'live']},
+                'orange': {kind: list(orange[kind]) for kind in ['dead', 'live']},
+                'period': int(period[i]),
+                'offset': list(allowed_offsets[offset_index[i]]),
+            }